@@ -6,9 +6,14 @@ N_ITERATIONS = 3
 #* shape Edge_ration tile(Edge_a, Edge_b)
 Edge_a = 10.0 # 20.0 / (np.sqrt(3) + 1.0)
 Edge_b = 10.0 # 20.0 - Edge_a
+#* coloring scheme, one of COLOR_SCHEMES. the drawing commands select it at runtime by the option --color=<scheme>
+COLOR_SCHEME = "rotation"
 ## end of configilation.
 
 TILE_NAMES = ["Gamma", "Delta", "Theta", "Lambda", "Xi", "Pi", "Sigma", "Phi", "Psi"]
+# label codes used by the flattened tile arrays (Gamma1, Gamma2 are the leaf Tiles of Gamma)
+TILE_LABELS = ["Gamma", "Gamma1", "Gamma2", "Delta", "Theta", "Lambda", "Xi", "Pi", "Sigma", "Phi", "Psi"]
+LABEL_CODES = {label: code for code, label in enumerate(TILE_LABELS)}
 
 def get_spectre_points(edge_a, edge_b):
     a = edge_a
@@ -95,14 +100,26 @@ def transPt(trsf, quad):
     # print(f"at transPt={trPt}")
     return trPt
 
-# Matrix * point
+# Matrix * Matrix, or stacks of matrices of shape (N,2,3)
 def mul(A, B):
     AB = A.copy()
-    AB[:,:2] = A[:,:2].dot(B[:,:2]) 
-    AB[:,2] += A[:,:2].dot(B[:,2])
+    AB[...,:,:2] = A[...,:,:2] @ B[...,:,:2]
+    AB[...,:,2] += (A[...,:,:2] @ B[...,:,2,None])[...,0]
     return AB
 
+def get_rotation_angles(transformations):
+    """
+    vectorized trot_inv angle.
+    transformations: array of transformation matrices, shape (N,2,3)
+    returns integer degree angles in (-180, 180]
+    """
+    angles = np.rint(np.rad2deg(np.arctan2(transformations[:,1,0], transformations[:,0,0]))).astype(np.int16)
+    angles[angles == -180] = 180
+    return angles
+
 class Tile:
+    level = 0 # hierarchy level of the single spectre
+
     def __init__(self, label):
         """
         _: NO list of Tile coordinate points
@@ -116,15 +133,19 @@ class Tile:
         return doProc(tile_transformation, self.label)
 
 class MetaTile:
-    def __init__(self, tiles=[], transformations=[], quad=SPECTRE_QUAD):
+    def __init__(self, tiles=[], transformations=[], quad=SPECTRE_QUAD, label=None, level=0):
         """
         tiles: list of Tiles(No points)
         transformations: list of transformation matrices
         quad: MetaTile quad points
+        label: supertile type used for shapes coloring
+        level: hierarchy level, 0 for the Gamma spectre pair and n for the n-th buildSupertiles
         """
         self.tiles = tiles
         self.transformations = transformations
         self.quad = quad
+        self.label = label
+        self.level = level
 
     def forEachTile(self, doProc, transformation=IDENTITY):
         """
@@ -133,7 +154,117 @@ class MetaTile:
         # TODO: parallelize?
         for tile, trsf in zip(self.tiles, self.transformations):
            tile.forEachTile(doProc, (mul(transformation, trsf)))
-                            
+
+# Tile address, uint64: root label code (4 bits) | child indices through MetaTile.tiles,
+# first index in the highest bits (ADDRESS_MAX_DEPTH * 3 bits) | path depth (6 bits).
+# Sorting addresses gives the forEachTile order, and a supertile shares the leading bits of its Tiles.
+ADDRESS_MAX_DEPTH = 18
+ADDRESS_DEPTH_BITS = 6
+ADDRESS_LABEL_SHIFT = ADDRESS_DEPTH_BITS + 3 * ADDRESS_MAX_DEPTH
+
+def pack_address(root_label, path):
+    """
+    root_label: label of the root MetaTile, e.g. "Delta"
+    path: sequence of child indices from the root
+    """
+    if len(path) > ADDRESS_MAX_DEPTH:
+        raise ValueError(f"pack_address: path depth {len(path)} > {ADDRESS_MAX_DEPTH}")
+    address = (LABEL_CODES[root_label] << ADDRESS_LABEL_SHIFT) | len(path)
+    for depth, index in enumerate(path):
+        address |= int(index) << (ADDRESS_LABEL_SHIFT - 3 * (depth + 1))
+    return np.uint64(address)
+
+def unpack_address(address):
+    """
+    returns (root_label, path)
+    """
+    address = int(address)
+    depth = address & ((1 << ADDRESS_DEPTH_BITS) - 1)
+    path = tuple((address >> (ADDRESS_LABEL_SHIFT - 3 * (i + 1))) & 7 for i in range(depth))
+    return TILE_LABELS[address >> ADDRESS_LABEL_SHIFT], path
+
+def address_prefix(addresses, depth):
+    """
+    addresses of the supertiles `depth` steps below the root containing the addressed tiles,
+    for grouping tiles by supertile
+    """
+    addresses = np.asarray(addresses, np.uint64)
+    keep = np.uint64(ADDRESS_LABEL_SHIFT - 3 * depth)
+    return ((addresses >> keep) << keep) | np.uint64(depth)
+
+def transform_at(tiles, address, transformation=IDENTITY):
+    """
+    compose only the transformations along the path of address.
+    tiles: dict of MetaTiles by label, as returned by buildSpectreTiles
+    returns (transformation matrix, addressed Tile or MetaTile)
+    """
+    root_label, path = unpack_address(address)
+    tile = tiles[root_label]
+    transformation = np.array(transformation, np.float64)
+    for index in path:
+        transformation = mul(transformation, tile.transformations[index])
+        tile = tile.tiles[index]
+    return transformation, tile
+
+def flattenTiles(tile, transformation=IDENTITY, level=1, addresses=False):
+    """
+    expand MetaTiles down to Tiles one hierarchy level at a time, in the same order as forEachTile.
+    Every MetaTile of a level is expanded for all its placements by one stacked matrix product.
+    tile: Tile or MetaTile to expand
+    transformation: transformation matrix of tile
+    level: hierarchy level of the supertiles reported in supertile_codes
+    addresses: also return the uint64 address of each Tile, see pack_address
+    returns (transformations, label_codes, supertile_codes[, tile_addresses])
+        transformations: (N,2,3) transformation matrices of the Tiles
+        label_codes: (N,) LABEL_CODES of the Tiles
+        supertile_codes: (N,) LABEL_CODES of the level-`level` supertile containing each Tile
+        tile_addresses: (N,) uint64 addresses of the Tiles from tile
+    """
+    nodes = [tile]
+    node_ids = np.zeros(1, np.intp)
+    transformations = np.array(transformation, np.float64)[None]
+    supertile_codes = np.full(1, LABEL_CODES.get(tile.label, 0), np.uint8)
+    tile_addresses = np.full(1, pack_address(tile.label, ()), np.uint64) if addresses else None
+    depth = 0
+    while any(isinstance(node, MetaTile) for node in nodes):
+        # expansion tables of the distinct nodes, a Tile expands to itself
+        counts = np.array([len(node.tiles) if isinstance(node, MetaTile) else 1 for node in nodes])
+        child_ids = np.zeros((len(nodes), counts.max()), np.intp)
+        child_transformations = np.zeros((len(nodes), counts.max(), 2, 3))
+        node_codes = np.array([LABEL_CODES.get(node.label, 0) for node in nodes], np.uint8)
+        is_level = np.array([isinstance(node, MetaTile) and node.level == level for node in nodes])
+        next_nodes = []
+        next_index = {}
+        for i, node in enumerate(nodes):
+            children = zip(node.tiles, node.transformations) if isinstance(node, MetaTile) else ((node, IDENTITY),)
+            for j, (child, trsf) in enumerate(children):
+                if id(child) not in next_index:
+                    next_index[id(child)] = len(next_nodes)
+                    next_nodes.append(child)
+                child_ids[i, j] = next_index[id(child)]
+                child_transformations[i, j] = trsf
+        # place the children of every node in order
+        node_counts = counts[node_ids]
+        parents = np.repeat(np.arange(len(node_ids)), node_counts)
+        slots = np.arange(len(parents)) - np.repeat(np.cumsum(node_counts) - node_counts, node_counts)
+        parent_ids = node_ids[parents]
+        transformations = mul(transformations[parents], child_transformations[parent_ids, slots])
+        supertile_codes = np.where(is_level[parent_ids], node_codes[parent_ids], supertile_codes[parents])
+        if addresses:
+            # paths of Tiles reached at an earlier depth stay unchanged
+            depth += 1
+            if depth > ADDRESS_MAX_DEPTH:
+                raise ValueError(f"flattenTiles: address depth {depth} > {ADDRESS_MAX_DEPTH}")
+            is_meta = np.array([isinstance(node, MetaTile) for node in nodes])[parent_ids]
+            digits = (slots.astype(np.uint64) << np.uint64(ADDRESS_LABEL_SHIFT - 3 * depth)) + np.uint64(1)
+            tile_addresses = tile_addresses[parents] + np.where(is_meta, digits, np.uint64(0))
+        node_ids = child_ids[parent_ids, slots]
+        nodes = next_nodes
+    label_codes = np.array([LABEL_CODES[node.label] for node in nodes], np.uint8)[node_ids]
+    if addresses:
+        return transformations, label_codes, supertile_codes, tile_addresses
+    return transformations, label_codes, supertile_codes
+
 def buildSpectreBase():
     tiles = {label: (Tile(label) ) for label in TILE_NAMES if label != "Gamma"}
     # special rule for Mystic == Gamma == Gamma1 + Gamma2
@@ -147,7 +278,8 @@ def buildSpectreBase():
                                              [0,1,SPECTRE_POINTS[8,1]]
                                          ]), trot(30))
                               ],
-                              quad=SPECTRE_QUAD.copy())
+                              quad=SPECTRE_QUAD.copy(),
+                              label="Gamma")
     # print(f"at buildSpectreBase: tiles[Gamma]={tiles['Gamma'].transformations}")
     return tiles
 
@@ -163,6 +295,7 @@ def buildSupertiles(input_tiles):
     # First, use any of the nine-unit tiles in "tiles" to obtain a
     # list of transformation matrices for placing tiles within supertiles.
     quad = input_tiles["Delta"].quad
+    level = input_tiles["Delta"].level + 1
 
     total_angle = 0
     rotation =  trot(total_angle) # IDENTITY.copy() #
@@ -199,7 +332,9 @@ def buildSupertiles(input_tiles):
 
     tiles = {label: MetaTile(tiles=[input_tiles[subst] for subst in substitutions if subst],
                      transformations=[trsf for subst, trsf in zip(substitutions, transformations) if subst],
-                     quad=super_quad
+                     quad=super_quad,
+                     label=label,
+                     level=level
                      ) for label, substitutions in (
                          ("Gamma",  ("Pi",  "Delta", None,  "Theta", "Sigma", "Xi",  "Phi",    "Gamma")),
                          ("Delta",  ("Xi",  "Delta", "Xi",  "Phi",   "Sigma", "Pi",  "Phi",    "Gamma")),
@@ -229,89 +364,243 @@ def update_transformation_range(T, _label): # drowsvg
     transformation_max_Y = max(transformation_max_Y, T[1,2]) # drowsvg
     return
 
-#### main process ####
-def  buildSpectreTiles(n_ITERATIONS,edge_a,edge_b, rotation_b=30):
+def convex_hull(points):
+    """
+    monotone chain convex hull of (n,2) points, counter-clockwise
+    """
+    points = np.unique(np.asarray(points, np.float64), axis=0)
+    if len(points) <= 2:
+        return points
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+    def half(pts):
+        hull = []
+        for p in pts:
+            while len(hull) >= 2 and cross(hull[-2], hull[-1], p) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull[:-1]
+    return np.array(half(points) + half(points[::-1]))
+
+def set_spectre_points(edge_a, edge_b):
     global SPECTRE_POINTS, Mystic_SPECTRE_POINTS, SPECTRE_QUAD
-
     SPECTRE_POINTS = get_spectre_points(edge_a, edge_b) # tile(Edge_a, Edge_b)
     Mystic_SPECTRE_POINTS = get_spectre_points(edge_b, edge_a) # tile(Edge_b, Edge_a)
     SPECTRE_QUAD = SPECTRE_POINTS[[3,5,7,11],:]
-    tiles = buildSpectreBase()
-    for _ in range(n_ITERATIONS):
-        tiles = buildSupertiles(tiles)
 
-    tiles["Delta"].forEachTile(update_transformation_range) # scan all Tile
+class SpectreTiling:
+    def __init__(self, edge_a, edge_b, rotation_b=30):
+        """
+        stack of supertile levels, deepened one level at a time reusing the previous levels.
+        levels[n]: dict of Tiles or MetaTiles by label after n buildSupertiles
+        """
+        self.edge_a = edge_a
+        self.edge_b = edge_b
+        self.rotation_b = rotation_b
+        set_spectre_points(edge_a, edge_b)
+        base = buildSpectreBase()
+        self.levels = [base]
+        # convex hulls of the Tile translations of each level and label, for the transformation range
+        self.hulls = [{label: (np.array([tile.transformations[i][:,2] for i in range(len(tile.tiles))], np.float64)
+                               if isinstance(tile, MetaTile) else np.zeros((1, 2)))
+                       for label, tile in base.items()}]
+
+    @property
+    def n_iterations(self):
+        return len(self.levels) - 1
+
+    @property
+    def tiles(self):
+        return self.levels[-1]
+
+    def deepen(self):
+        """
+        build one more level of supertiles from the current top level
+        """
+        input_tiles = self.levels[-1]
+        input_hulls = self.hulls[-1]
+        tiles = buildSupertiles(input_tiles)
+        labels = {id(tile): label for label, tile in input_tiles.items()}
+        self.hulls.append({label: convex_hull(np.concatenate([
+                               input_hulls[labels[id(child)]] @ trsf[:,:2].T + trsf[:,2]
+                               for child, trsf in zip(tile.tiles, tile.transformations)]))
+                           for label, tile in tiles.items()})
+        self.levels.append(tiles)
+        return tiles
+
+    def deepen_to(self, n_iterations):
+        """
+        returns levels[n_iterations], building only the missing levels
+        """
+        while self.n_iterations < n_iterations:
+            self.deepen()
+        return self.levels[n_iterations]
+
+    def get_transformation_range(self, n_iterations=None, label="Delta"):
+        """
+        (min_X, min_Y, max_X, max_Y) of the Tile translations with a margin of one tile, as buildSpectreTiles
+        """
+        hull = self.hulls[self.n_iterations if n_iterations is None else n_iterations][label]
+        margin = self.edge_a * 3 + self.edge_b * 3
+        (min_X, min_Y), (max_X, max_Y) = hull.min(axis=0), hull.max(axis=0)
+        return (int(np.floor(min_X - margin)), int(np.floor(min_Y - margin)),
+                int(np.ceil(max_X + margin)), int(np.ceil(max_Y + margin)))
+
+    def flatten(self, label="Delta", addresses=False):
+        """
+        flattenTiles of the top level tile of label
+        """
+        return flattenTiles(self.tiles[label], addresses=addresses)
+
+#### main process ####
+last_tiling = None
+def  buildSpectreTiles(n_ITERATIONS,edge_a,edge_b, rotation_b=30):
+    """
+    returns the tiles of n_ITERATIONS levels, reusing the levels of the previous call with the same edges
+    """
+    global last_tiling
+    if last_tiling is None or (last_tiling.edge_a, last_tiling.edge_b, last_tiling.rotation_b) != (edge_a, edge_b, rotation_b):
+        last_tiling = SpectreTiling(edge_a, edge_b, rotation_b)
+    set_spectre_points(edge_a, edge_b)
+    tiles = last_tiling.deepen_to(n_ITERATIONS)
 
     global transformation_min_X, transformation_min_Y, transformation_max_X, transformation_max_Y
-    transformation_min_X = int(np.floor(transformation_min_X - Edge_a * 3 - Edge_b * 3))
-    transformation_min_Y = int(np.floor(transformation_min_Y - Edge_a * 3 - Edge_b * 3))
-    transformation_max_X = int(np.ceil(transformation_max_X + Edge_a * 3 + Edge_b * 3))
-    transformation_max_Y = int(np.ceil(transformation_max_Y + Edge_a * 3 + Edge_b * 3))
+    transformation_min_X, transformation_min_Y, transformation_max_X, transformation_max_Y = last_tiling.get_transformation_range(n_ITERATIONS)
 
     return tiles
 
 
 ### drawing parameter data
-# Color map from Figure 5.3
-COLOR_MAP = {
-	'Gamma': np.array((203, 157, 126),'f')/255.,
-	'Gamma1': np.array((203, 157, 126),'f')/255.,
-	'Gamma2': np.array((203, 157, 126),'f')/255.,
-	'Delta': np.array((163, 150, 133),'f')/255.,
-	'Theta': np.array((208, 215, 150),'f')/255.,
-	'Lambda': np.array((184, 205, 178),'f')/255.,
-	'Xi': np.array((211, 177, 144),'f')/255.,
-	'Pi': np.array((218, 197, 161),'f')/255.,
-	'Sigma': np.array((191, 146, 126),'f')/255.,
-	'Phi': np.array((228, 213, 167),'f')/255.,
-	'Psi': np.array((224, 223, 156),'f')/255.
+# label color maps, RGB
+COLOR_MAPS = {
+    # Color map from Figure 5.3
+    "figure5.3": {
+        "Gamma":  (203, 157, 126),
+        "Gamma1": (203, 157, 126),
+        "Gamma2": (203, 157, 126),
+        "Delta":  (163, 150, 133),
+        "Theta":  (208, 215, 150),
+        "Lambda": (184, 205, 178),
+        "Xi":     (211, 177, 144),
+        "Pi":     (218, 197, 161),
+        "Sigma":  (191, 146, 126),
+        "Phi":    (228, 213, 167),
+        "Psi":    (224, 223, 156)
+    },
+    "orig": {
+        "Gamma":  (255, 255, 255),
+        "Gamma1": (255, 255, 255),
+        "Gamma2": (255, 255, 255),
+        "Delta":  (220, 220, 220),
+        "Theta":  (255, 191, 191),
+        "Lambda": (255, 160, 122),
+        "Xi":     (255, 242,   0),
+        "Pi":     (135, 206, 250),
+        "Sigma":  (245, 245, 220),
+        "Phi":    (  0, 255,   0),
+        "Psi":    (  0, 255, 255)
+    },
+    "mystics": {
+        "Gamma":  (196, 201, 169),
+        "Gamma1": (196, 201, 169),
+        "Gamma2": (156, 160, 116),
+        "Delta":  (247, 252, 248),
+        "Theta":  (247, 252, 248),
+        "Lambda": (247, 252, 248),
+        "Xi":     (247, 252, 248),
+        "Pi":     (247, 252, 248),
+        "Sigma":  (247, 252, 248),
+        "Phi":    (247, 252, 248),
+        "Psi":    (247, 252, 248)
+    },
+    "pride": {
+        "Gamma":  (255, 255, 255),
+        "Gamma1": ( 97,  57,  21),
+        "Gamma2": ( 64,  64,  64),
+        "Delta":  (  2, 129,  33),
+        "Theta":  (  0,  76, 255),
+        "Lambda": (118,   0, 136),
+        "Xi":     (229,   0,   0),
+        "Pi":     (255, 175, 199),
+        "Sigma":  (115, 215, 238),
+        "Phi":    (255, 141,   0),
+        "Psi":    (255, 238,   0)
+    }
 }
-
-# COLOR_MAP_orig
-COLOR_MAP = {
-	'Gamma': np.array((255, 255, 255),'f')/255.,
-	'Gamma1': np.array((255, 255, 255),'f')/255.,
-	'Gamma2': np.array((255, 255, 255),'f')/255.,
-	'Delta': np.array((220, 220, 220),'f')/255.,
-	'Theta': np.array((255, 191, 191),'f')/255.,
-	'Lambda': np.array((255, 160, 122),'f')/255.,
-	'Xi': np.array((255, 242, 0),'f')/255.,
-	'Pi': np.array((135, 206, 250),'f')/255.,
-	'Sigma': np.array((245, 245, 220),'f')/255.,
-	'Phi': np.array((0, 255, 0),'f')/255.,
-	'Psi': np.array((0, 255, 255),'f')/255.
+# label color map of the "label", "rotation" and "level" schemes
+LABEL_COLOR_MAP = COLOR_MAPS["pride"]
+COLOR_MAP = {label: np.array(rgb, 'f')/255. for label, rgb in LABEL_COLOR_MAP.items()}
+
+# tile color by rotation angle, Gamma2 (mystic) tiles take MYSTIC_COLOR
+ROTATION_COLORS = {
+    # -180: (  0,   0, 255), # sangle -180 == 180
+    -120: (230, 204,   0),
+    -60:  (230, 102, 102),
+    0:    (255,   0,   0),
+    60:   (102, 102, 230),
+    120:  (  0, 204, 230),
+    180:  (  0,   0, 255)
 }
+MYSTIC_COLOR = (64, 64, 64)
+BACKGROUND_COLOR = (247, 252, 248)
 
-# COLOR_MAP_mystics 
-COLOR_MAP = {
-	'Gamma': np.array((196, 201, 169),'f')/255.,
-	'Gamma1': np.array((196, 201, 169),'f')/255.,
-	'Gamma2': np.array((156, 160, 116),'f')/255.,
-	'Delta': np.array((247, 252, 248),'f')/255.,
-	'Theta': np.array((247, 252, 248),'f')/255.,
-	'Lambda': np.array((247, 252, 248),'f')/255.,
-	'Xi': np.array((247, 252, 248),'f')/255.,
-	'Pi': np.array((247, 252, 248),'f')/255.,
-	'Sigma': np.array((247, 252, 248),'f')/255.,
-	'Phi': np.array((247, 252, 248),'f')/255.,
-	'Psi': np.array((247, 252, 248),'f')/255.
-}
+# rotation angles are multiples of 30 degrees
+N_ANGLE_BINS = 12
+def get_angle_bins(angles):
+    return (np.asarray(angles) // 30) % N_ANGLE_BINS
 
-# COLOR_MAP_pride
-COLOR_MAP = {
-    "Gamma":  np.array((255, 255, 255),'f')/255.,
-    "Gamma1": np.array(( 97,  57,  21),'f')/255.,
-    "Gamma2": np.array(( 64,  64,  64),'f')/255.,
-    "Delta":  np.array((  2, 129,  33),'f')/255.,
-    "Theta":  np.array((  0,  76, 255),'f')/255.,
-    "Lambda": np.array((118,   0, 136),'f')/255.,
-    "Xi":     np.array((229,   0,   0),'f')/255.,
-    "Pi":     np.array((255, 175, 199),'f')/255.,
-    "Sigma":  np.array((115, 215, 238),'f')/255.,
-    "Phi":    np.array((255, 141,   0),'f')/255.,
-    "Psi":    np.array((255, 238,   0),'f')/255.
+def build_color_lut(color_map, angle_colors={}, mystic_color=None):
+    """
+    color lookup table indexed by [label code, angle bin]
+    color_map: label -> RGB
+    angle_colors: degree angle -> RGB, overrides color_map
+    mystic_color: RGB of Gamma2, overrides angle_colors
+    """
+    lut = np.zeros((len(TILE_LABELS), N_ANGLE_BINS, 3), np.uint8)
+    for label, rgb in color_map.items():
+        lut[LABEL_CODES[label], :] = rgb
+    for angle, rgb in angle_colors.items():
+        lut[:, get_angle_bins(angle)] = rgb
+    if mystic_color is not None:
+        lut[LABEL_CODES["Gamma2"], :] = mystic_color
+    return lut
+
+COLOR_SCHEMES = {
+    "label": build_color_lut(LABEL_COLOR_MAP),
+    "rotation": build_color_lut(LABEL_COLOR_MAP, ROTATION_COLORS, MYSTIC_COLOR),
+    "mystic": build_color_lut({label: BACKGROUND_COLOR for label in TILE_LABELS}, mystic_color=MYSTIC_COLOR),
+    "level": build_color_lut(LABEL_COLOR_MAP), # indexed by the supertile codes of flattenTiles
+    **{name: build_color_lut(color_map) for name, color_map in COLOR_MAPS.items()}
 }
 
+def get_color_scheme_option(argv, default=None):
+    """
+    scheme of the command option --color=<scheme>, for the __main__ of the drawing commands
+    """
+    return next((arg.split("=", 1)[1] for arg in argv if arg.startswith("--color=")), default)
+
+def get_color_arrays(label_codes, angles, scheme=None):
+    """
+    label_codes: (N,) LABEL_CODES, the supertile codes of flattenTiles for the "level" scheme
+    angles: (N,) integer degree angles
+    scheme: name of COLOR_SCHEMES, default COLOR_SCHEME
+    returns (N,3) uint8 RGB colors
+    """
+    scheme = COLOR_SCHEME if scheme is None else scheme
+    if scheme not in COLOR_SCHEMES:
+        raise ValueError(f"unknown color scheme {scheme}, expected one of {list(COLOR_SCHEMES)}")
+    return COLOR_SCHEMES[scheme][label_codes, get_angle_bins(angles)]
+
+def get_tile_colors(transformations, label_codes, supertile_codes, scheme=None):
+    """
+    colors of the flattenTiles arrays
+    returns (angles, (N,3) uint8 RGB colors)
+    """
+    scheme = COLOR_SCHEME if scheme is None else scheme
+    angles = get_rotation_angles(transformations)
+    update_trot_inv_prof(angles, label_codes)
+    return angles, get_color_arrays(supertile_codes if scheme == "level" else label_codes, angles, scheme)
+
 trot_inv_prof = {
     # -180: 0, # to be 0, becaluse angle -180=>180
     -150: 0, # Gamma2
@@ -336,26 +625,17 @@ def print_trot_inv_prof():
     print("}")
     return trot_inv_prof
 
-def get_color_array(tile_transformation, label):
+def update_trot_inv_prof(angles, label_codes):
     global trot_inv_prof
-    angle, _scale = trot_inv(tile_transformation)
-    trot_inv_prof[angle] += 1
-    if (label == 'Gamma2'):
-        trot_inv_prof[360] += 1
-        return np.array([0.25,0.25,0.25])
-    else :
-        rgb = {
-                # -180: (  0,   0, 1.0), # sangle -180 == 180
-                -120: (0.9, 0.8,   0),
-                -60:  (0.9, 0.4, 0.4),
-                0:    (1.0,   0,   0),
-                60:   (0.4, 0.4, 0.9),
-                120:  (  0, 0.8, 0.9),
-                180:  (  0,   0, 1.0)
-        }[angle]
-        if rgb:
-            return np.array(rgb, 'f')
-        else:
-            print(f"Inalid color {rgb} {label}, {tile_transformation}")
-    return COLOR_MAP[label]
+    for angle, count in zip(*np.unique(angles, return_counts=True)):
+        trot_inv_prof[int(angle)] += int(count)
+    trot_inv_prof[360] += int(np.count_nonzero(label_codes == LABEL_CODES["Gamma2"]))
 
+def get_color_array(tile_transformation, label):
+    """
+    color of a single Tile, RGB in [0, 1]
+    """
+    label_codes = np.array([LABEL_CODES[label]])
+    angles = get_rotation_angles(np.asarray(tile_transformation)[None])
+    update_trot_inv_prof(angles, label_codes)
+    return get_color_arrays(label_codes, angles)[0] / 255.
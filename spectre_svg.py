@@ -0,0 +1,163 @@
+# parallel chunked SVG serialization of the flattened tiles #####
+import os
+import re
+from multiprocessing import Pool
+import numpy as np
+import drawsvg
+from spectre import MetaTile, LABEL_CODES, COLOR_SCHEME, COLOR_SCHEMES, mul, get_rotation_angles, get_color_arrays, IDENTITY
+
+# the <use> element written by drawsvg.Use in spectre_tiles_drow.drawPolygon2Svg
+USE_TEMPLATE = '<use xlink:href="#%s" x="0" y="0" transform="translate(%r,%r) rotate(%d) scale(1,%d)" fill="rgb(%d, %d, %d)" fill-opacity="0.6" stroke="gray" stroke-width="%s" />\n'
+
+# hierarchical output: one <symbol> per distinct MetaTile placement, <use> of its children by their transformations
+SYMBOL_TEMPLATE = '<symbol id="%s" overflow="visible">\n%s</symbol>\n'
+SYMBOL_USE_TEMPLATE = '<use xlink:href="#%s" transform="matrix(%r %r %r %r %r %r)" />\n'
+SHAPE_USE_TEMPLATE = '<use xlink:href="#%s" transform="matrix(%r %r %r %r %r %r)" fill="rgb(%d, %d, %d)" fill-opacity="0.6" stroke="gray" stroke-width="%s" />\n'
+
+def format_uses(shape_ids, translations, angles, color_arrays, scaleY):
+    """
+    <use> elements of a chunk of tiles, formatted by one % over the whole chunk
+    shape_ids: (N,) svg ids of the shapes
+    translations: (N,2) translations
+    angles: (N,) integer degree angles
+    color_arrays: (N,3) uint8 RGB colors
+    """
+    values = np.empty((len(shape_ids), 9), object)
+    values[:,0] = shape_ids
+    values[:,1] = translations[:,0].tolist() # python float for repr, as in f"{T[0,2]}"
+    values[:,2] = translations[:,1].tolist()
+    values[:,3] = angles.tolist()
+    values[:,4] = scaleY
+    values[:,5:8] = color_arrays.tolist()
+    values[:,8] = np.where(color_arrays.any(axis=1), "0.1", "0")
+    return (USE_TEMPLATE * len(shape_ids)) % tuple(values.ravel())
+
+def format_uses_chunk(args):
+    return format_uses(*args)
+
+def get_svg_header(shapes, view_box):
+    """
+    xml header, <svg> and <defs> of the shapes as written by drawsvg
+    returns (header, svg id of each shape)
+    """
+    svgContens = drawsvg.Drawing(view_box[2], view_box[3])
+    svgContens.view_box = view_box
+    for shape in shapes:
+        svgContens.append(drawsvg.Use(shape, 0, 0))
+    svg = svgContens.as_svg()
+    ids = re.findall(r'<use xlink:href="#([^"]+)"', svg)
+    return svg[:svg.index('<use')], ids
+
+def save_svg(fileName, shapes, shape_codes, transformations, angles, color_arrays, view_box, scaleY, processes=None, chunk_size=10000):
+    """
+    write the tiles as <use> references to shapes, the chunks of tiles are formatted
+    by a process pool and written in order, byte-identical to the serial output.
+    shapes: drawsvg elements referenced by the tiles
+    shape_codes: (N,) index of the shape of each tile
+    transformations: (N,2,3) transformation matrices
+    angles: (N,) integer degree angles of transformations
+    color_arrays: (N,3) uint8 RGB colors
+    view_box: (min_X, min_Y, width, height)
+    processes: worker processes, default os.cpu_count(), 1 to format in this process
+    """
+    # drawsvg numbers the shapes in the order of their first reference
+    first_uses = sorted((np.argmax(shape_codes == code), code) for code in np.unique(shape_codes))
+    header, ids = get_svg_header([shapes[code] for _, code in first_uses], view_box)
+    shape_ids = np.empty(len(shapes), object)
+    shape_ids[[code for _, code in first_uses]] = ids
+
+    chunks = ((shape_ids[shape_codes[i:i+chunk_size]], transformations[i:i+chunk_size,:,2], angles[i:i+chunk_size], color_arrays[i:i+chunk_size], scaleY)
+              for i in range(0, len(transformations), chunk_size))
+    processes = os.cpu_count() if processes is None else processes
+    with open(fileName, 'w', encoding='utf-8') as f:
+        f.write(header)
+        if processes > 1:
+            with Pool(processes) as pool:
+                for fragment in pool.imap(format_uses_chunk, chunks):
+                    f.write(fragment)
+        else:
+            for fragment in map(format_uses_chunk, chunks):
+                f.write(fragment)
+        f.write('</svg>')
+
+def matrix_values(T):
+    """
+    svg matrix(a b c d e f) values of a transformation matrix
+    """
+    return tuple(np.asarray(T, np.float64).T.ravel().tolist())
+
+def get_symbols(tile, shape_ids, scheme=None):
+    """
+    <symbol> elements of the MetaTiles under tile, children first, each built from <use> references
+    to its children with their transformations. The Tiles are <use> of the shapes with their colors.
+    A color scheme depending on the rotation angle needs the absolute orientation of a MetaTile,
+    and the "level" scheme the level 1 supertile of a level 0 MetaTile, so a MetaTile has one symbol
+    per distinct orientation and supertile it is placed with, only when the scheme needs them.
+    tile: root Tile or MetaTile
+    shape_ids: svg ids of the spectre and the mystic shape
+    returns (symbols, <use> of the root, number of Tiles)
+    """
+    scheme = COLOR_SCHEME if scheme is None else scheme
+    get_color_arrays(np.zeros(1, np.uint8), np.zeros(1, np.int16), scheme) # unknown scheme raises ValueError
+    lut = COLOR_SCHEMES[scheme]
+    by_angle = bool((lut != lut[:, :1]).any())
+    by_supertile = scheme == "level"
+    symbols = []
+    symbol_ids = {} # (MetaTile, orientation, supertile code) -> (svg id, number of Tiles)
+    label_counts = {}
+
+    def shape_use(child, T, orientation, supertile_code):
+        code = LABEL_CODES[child.label]
+        angles = get_rotation_angles(mul(orientation, T)[None])
+        rgb = get_color_arrays(np.array([supertile_code if by_supertile else code]), angles, scheme)[0]
+        shape_id = shape_ids[int(code == LABEL_CODES["Gamma2"])]
+        return SHAPE_USE_TEMPLATE % (shape_id, *matrix_values(T), *rgb.tolist(), "0.1" if rgb.any() else "0")
+
+    def get_symbol(tile, orientation, supertile_code):
+        if tile.level >= 1:
+            supertile_code = LABEL_CODES[tile.label] if tile.level == 1 else None
+        key = (id(tile),
+               tuple((np.round(orientation[:, :2], 6) + 0.0).ravel().tolist()) if by_angle else None,
+               supertile_code if by_supertile else None)
+        if key not in symbol_ids:
+            uses = []
+            num_tiles = 0
+            for child, trsf in zip(tile.tiles, tile.transformations):
+                if isinstance(child, MetaTile):
+                    child_orientation = mul(orientation, trsf)
+                    child_orientation[:, 2] = 0
+                    child_id, child_tiles = get_symbol(child, child_orientation, supertile_code)
+                    uses.append(SYMBOL_USE_TEMPLATE % (child_id, *matrix_values(trsf)))
+                    num_tiles += child_tiles
+                else:
+                    uses.append(shape_use(child, trsf, orientation, supertile_code))
+                    num_tiles += 1
+            name = f"{tile.label}_L{tile.level}" # Gamma1, Gamma2 are leaf labels
+            label_counts[name] = label_counts.get(name, 0) + 1
+            symbol_id = name if label_counts[name] == 1 else f"{name}_{label_counts[name] - 1}"
+            symbols.append(SYMBOL_TEMPLATE % (symbol_id, ''.join(uses)))
+            symbol_ids[key] = (symbol_id, num_tiles)
+        return symbol_ids[key]
+
+    root_code = LABEL_CODES.get(tile.label, 0)
+    if not isinstance(tile, MetaTile):
+        return [], shape_use(tile, IDENTITY, IDENTITY, root_code), 1
+    root_id, num_tiles = get_symbol(tile, np.array(IDENTITY, np.float64), root_code)
+    return symbols, f'<use xlink:href="#{root_id}" />\n', num_tiles
+
+def save_symbol_svg(fileName, tile, shapes, view_box, scheme=None):
+    """
+    write tile as nested <symbol> elements, only the root is instantiated.
+    The size is O(levels * labels * 8) instead of O(Tiles), see get_symbols.
+    shapes: drawsvg elements of the spectre and the mystic shape
+    view_box: (min_X, min_Y, width, height)
+    returns the number of Tiles
+    """
+    header, ids = get_svg_header(shapes, view_box)
+    symbols, root_use, num_tiles = get_symbols(tile, ids, scheme)
+    with open(fileName, 'w', encoding='utf-8') as f:
+        f.write(header)
+        f.writelines(symbols)
+        f.write(root_use)
+        f.write('</svg>')
+    return num_tiles
@@ -0,0 +1,119 @@
+# sweep the edge ratio tile(edge_a, edge_b) and generate animation frames #####
+import os
+import sys
+from time import time
+import numpy as np
+import spectre
+from spectre import SpectreTiling, flattenTiles, get_tile_colors, get_spectre_points, N_ITERATIONS, LABEL_CODES, get_color_scheme_option
+
+## sweep configlation
+#* number of animation frames
+N_FRAMES = 60
+#* tile(edge_a, 20 - edge_a) for edge_a from SWEEP_EDGE_A[0] to SWEEP_EDGE_A[1]
+SWEEP_EDGE_A = (2.0, 18.0)
+SWEEP_EDGE_SUM = 20.0
+## end of sweep configilation.
+
+def get_ratio_coefficients(n_iterations, rotation_b=30, scheme=None):
+    """
+    Every vertex is linear in (edge_a, edge_b), because the combinatorial structure of
+    buildSupertiles and the rotations do not depend on them. Build the tiling for tile(1, 0)
+    and tile(0, 1) once, the vertices of tile(a, b) are then coefficients @ (a, b).
+    returns (coefficients (N,14,2,2), label_codes (N,), color_arrays (N,3))
+    """
+    # own tilings, buildSpectreTiles would replace its cached tiling and the transformation range.
+    # SpectreTiling sets the spectre points only to build its base level.
+    saved_points = (spectre.SPECTRE_POINTS, spectre.Mystic_SPECTRE_POINTS, spectre.SPECTRE_QUAD)
+    tiling_a = SpectreTiling(1.0, 0.0, rotation_b)
+    tiling_b = SpectreTiling(0.0, 1.0, rotation_b)
+    spectre.SPECTRE_POINTS, spectre.Mystic_SPECTRE_POINTS, spectre.SPECTRE_QUAD = saved_points
+    transformations_a, label_codes, supertile_codes = flattenTiles(tiling_a.deepen_to(n_iterations)["Delta"])
+    transformations_b, _, _ = flattenTiles(tiling_b.deepen_to(n_iterations)["Delta"])
+
+    # the mystic tile(b, a) swaps the edge coefficients of its outline
+    is_mystic = (label_codes == LABEL_CODES["Gamma2"])[:,None,None]
+    points_a = get_spectre_points(1.0, 0.0)
+    points_b = get_spectre_points(0.0, 1.0)
+    rotations = transformations_a[:,:,:2]
+    vertices_a = np.einsum('nij,nkj->nki', rotations, np.where(is_mystic, points_b, points_a)) + transformations_a[:,None,:,2]
+    vertices_b = np.einsum('nij,nkj->nki', rotations, np.where(is_mystic, points_a, points_b)) + transformations_b[:,None,:,2]
+    _angles, color_arrays = get_tile_colors(transformations_a, label_codes, supertile_codes, scheme)
+    return np.stack([vertices_a, vertices_b], axis=-1), label_codes, color_arrays
+
+def sweep_vertices(coefficients, ratios):
+    """
+    coefficients: (N,14,2,2) of get_ratio_coefficients
+    ratios: iterable of (edge_a, edge_b)
+    yields (N,14,2) tile vertices for each ratio
+    """
+    flat_coefficients = coefficients.reshape(-1, 2) # one (N*14*2, 2) matrix vector product per ratio
+    for edge_a, edge_b in ratios:
+        yield (flat_coefficients @ np.array((edge_a, edge_b))).reshape(coefficients.shape[:3])
+
+def get_svg_frame(vertices, color_arrays, stroke_width=0.1):
+    """
+    one <path> per color holding the outlines of all its tiles
+    """
+    x_min, y_min = np.floor(vertices.reshape(-1, 2).min(axis=0)).astype(int)
+    x_max, y_max = np.ceil(vertices.reshape(-1, 2).max(axis=0)).astype(int)
+    svg = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{x_max - x_min}" height="{y_max - y_min}" viewBox="{x_min} {y_min} {x_max - x_min} {y_max - y_min}">\n']
+    tile_path = 'M' + 'L'.join(['%.2f %.2f'] * vertices.shape[1]) + 'Z'
+    colors, color_ids = np.unique(color_arrays, axis=0, return_inverse=True)
+    for color_id, (r, g, b) in enumerate(colors):
+        group = vertices[color_ids.reshape(-1) == color_id]
+        d = (tile_path * len(group)) % tuple(group.ravel())
+        svg.append(f'<path d="{d}" fill="rgb({r}, {g}, {b})" fill-opacity="0.6" stroke="gray" stroke-width="{stroke_width}" />\n')
+    svg.append('</svg>\n')
+    return ''.join(svg)
+
+def save_svg_frames(dirName, coefficients, color_arrays, ratios):
+    os.makedirs(dirName, exist_ok=True)
+    for i, vertices in enumerate(sweep_vertices(coefficients, ratios)):
+        with open(os.path.join(dirName, f"frame{i:04d}.svg"), 'w') as f:
+            f.write(get_svg_frame(vertices, color_arrays))
+
+def save_raster_frames(dirName, coefficients, color_arrays, ratios, dpi=100):
+    """
+    PNG frames, reusing one matplotlib figure and only updating the polygon vertices
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import PolyCollection
+
+    os.makedirs(dirName, exist_ok=True)
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.set_aspect('equal')
+    ax.axis('off')
+    polygons = PolyCollection([], facecolors=color_arrays / 255., edgecolors='gray', linewidths=0.2)
+    ax.add_collection(polygons)
+    for i, vertices in enumerate(sweep_vertices(coefficients, ratios)):
+        polygons.set_verts(vertices)
+        ax.set_xlim(vertices[:,:,0].min(), vertices[:,:,0].max())
+        ax.set_ylim(vertices[:,:,1].min(), vertices[:,:,1].max())
+        fig.savefig(os.path.join(dirName, f"frame{i:04d}.png"), dpi=dpi)
+    plt.close(fig)
+
+if __name__ == '__main__':
+    start = time()
+    coefficients, label_codes, color_arrays = get_ratio_coefficients(N_ITERATIONS, scheme=get_color_scheme_option(sys.argv))
+    num_tiles = len(coefficients)
+    time1 = time()-start
+    print(f"ratio coefficients took {round(time1, 4)} seconds, {num_tiles} tiles")
+
+    edge_a = np.linspace(*SWEEP_EDGE_A, N_FRAMES)
+    ratios = np.stack([edge_a, SWEEP_EDGE_SUM - edge_a], axis=1)
+    start = time()
+    for _vertices in sweep_vertices(coefficients, ratios):
+        pass
+    time2 = time()-start
+    print(f"sweep of {len(ratios)} ratios took {round(time2, 4)} seconds, {round(60 * len(ratios) / time2)} ratios/minute")
+
+    start = time()
+    dirName = f"spectre_sweep_{N_ITERATIONS}-{num_tiles}"
+    if '--raster' in sys.argv:
+        save_raster_frames(dirName, coefficients, color_arrays, ratios)
+    else:
+        save_svg_frames(dirName, coefficients, color_arrays, ratios)
+    time3 = time()-start
+    print(f"{len(ratios)} frames took {round(time3, 4)} seconds, saved to {dirName}")
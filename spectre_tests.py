@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 import sys
-from spectre import SPECTRE_POINTS, Mystic_SPECTRE_POINTS, buildSpectreTiles, trot_inv, TILE_NAMES
+import numpy as np
+from spectre import SPECTRE_POINTS, Mystic_SPECTRE_POINTS, buildSpectreTiles, trot_inv, TILE_NAMES, TILE_LABELS, flattenTiles, get_rotation_angles, get_color_arrays, get_color_array, COLOR_SCHEMES
 
 INFO = {'total':0, 'positive_x':0, 'positive_y':0, 'negative_x':0, 'negative_y':0, 'x_zeros':0, 'y_zeros':0, 'mystic':0}
 def reset_info():
@@ -123,8 +124,194 @@ def test(a=10.0, b=10.0, rotation=30, steps=(1,2,3,4,5,6,7,8)):
         ## we assume that this alternating will continue forever
         ## this should be confirmed by a faster computer than can do more iterations.
 
+def test_flatten(a=10.0, b=10.0, steps=(1,2,3,4)):
+    for iterations in steps:
+        x = buildSpectreTiles(iterations,a,b)
+        tiles = []
+        x["Delta"].forEachTile(lambda T, label: tiles.append((T, label)))
+        transformations, label_codes, supertile_codes = flattenTiles(x["Delta"])
+        assert len(transformations) == len(tiles)
+        assert np.allclose(transformations, [T for T, _ in tiles], atol=1e-3)
+        assert [TILE_LABELS[code] for code in label_codes] == [label for _, label in tiles]
+        angles = get_rotation_angles(transformations)
+        assert list(angles) == [trot_inv(T)[0] for T, _ in tiles]
+        for scheme in COLOR_SCHEMES:
+            assert get_color_arrays(label_codes, angles, scheme).shape == (len(tiles), 3)
+        assert np.allclose(get_color_arrays(label_codes[:1], angles[:1]) / 255., get_color_array(*tiles[0]))
+        print('FLATTEN ITERATIONS:', iterations, 'tiles:', len(tiles), 'ok')
+
+def test_addresses(a=10.0, b=10.0, iterations=3):
+    from spectre import transform_at, unpack_address, pack_address, address_prefix, LABEL_CODES
+    x = buildSpectreTiles(iterations,a,b)
+    transformations, label_codes, _supertile_codes, addresses = flattenTiles(x["Delta"], addresses=True)
+    assert len(np.unique(addresses)) == len(addresses)
+    assert (np.sort(addresses) == addresses).all() # forEachTile order
+    for T, code, address in zip(transformations, label_codes, addresses):
+        T_at, tile = transform_at(x, address)
+        assert np.allclose(T_at, T) and LABEL_CODES[tile.label] == code
+        assert pack_address(*unpack_address(address)) == address
+    supertiles, counts = np.unique(address_prefix(addresses, 1), return_counts=True)
+    assert len(supertiles) == len(x["Delta"].tiles) and counts.sum() == len(addresses)
+    print('ADDRESSES ITERATIONS:', iterations, 'tiles:', len(addresses), 'ok')
+
+def test_validate(iterations=4, ratios=((10.0, 10.0), (7.3, 12.7))):
+    from spectre_validate import validate_tiling
+    for a, b in ratios:
+        transformations, label_codes, _supertile_codes = flattenTiles(buildSpectreTiles(iterations,a,b)["Delta"])
+        report = validate_tiling(transformations, label_codes, a, b)
+        assert report['valid'], report
+        moved = transformations.copy()
+        moved[5,:,2] += (a * 0.1, b * 0.05)
+        assert 5 in validate_tiling(moved, label_codes, a, b)['overlaps']
+        duplicated = validate_tiling(np.concatenate([transformations, transformations[5:6]]), np.concatenate([label_codes, label_codes[5:6]]), a, b)
+        assert len(duplicated['overlaps']) > 0 and not duplicated['area_ok']
+        interior = len(transformations) // 2
+        keep = np.arange(len(transformations)) != interior
+        removed = validate_tiling(transformations[keep], label_codes[keep], a, b)
+        assert len(removed['gaps']) > 0 and not removed['area_ok']
+    assert validate_tiling(transformations[:0], label_codes[:0], a, b)['valid']
+    print('VALIDATE ITERATIONS:', iterations, 'ratios:', len(ratios), 'ok')
+
+def test_buffers(a=10.0, b=10.0, iterations=3):
+    from spectre import get_spectre_points
+    from spectre_tiles_buffer import triangulate_polygon, get_tile_buffers, get_instance_buffers, get_front_face, save_buffers
+    def area(pts):
+        return 0.5 * abs(np.dot(pts[:,0], np.roll(pts[:,1], -1)) - np.dot(pts[:,1], np.roll(pts[:,0], -1)))
+    for edge_a, edge_b in ((a, b), (7.3, 12.7)):
+        for points in (get_spectre_points(edge_a, edge_b), get_spectre_points(edge_b, edge_a)): # spectre and mystic
+            triangles = triangulate_polygon(points)
+            assert len(triangles) == len(points) - 2
+            assert np.isclose(sum(area(points[list(triangle)]) for triangle in triangles), area(points))
+        # the mystic triangles of the instanced base mesh cover the mystic outline
+        base_vertices, base_indices, _instances = get_instance_buffers(buildSpectreTiles(1,edge_a,edge_b)["Delta"], edge_a, edge_b)
+        positions = np.asarray(base_vertices)['position'].astype(np.float64)
+        mystic_triangles = np.asarray(base_indices).reshape(2, -1, 3)[1]
+        assert (mystic_triangles >= len(points)).all()
+        assert np.isclose(sum(area(positions[triangle]) for triangle in mystic_triangles), area(positions[len(points):]), rtol=1e-5)
+    x = buildSpectreTiles(iterations,a,b)
+    vertices, indices = get_tile_buffers(x["Delta"], a, b)
+    _base_vertices, _base_indices, instances = get_instance_buffers(x["Delta"], a, b)
+    assert len(vertices) == len(instances) * len(SPECTRE_POINTS)
+    assert len(indices) == len(instances) * (len(SPECTRE_POINTS) - 2) * 3
+    assert max(indices) == len(vertices) - 1
+    # every mesh triangle is counter-clockwise in world space, the odd iterations mirror every instance
+    corners = np.asarray(vertices)['position'].astype(np.float64)[np.asarray(indices).reshape(-1, 3)]
+    edge1, edge2 = corners[:,1] - corners[:,0], corners[:,2] - corners[:,0]
+    assert (edge1[:,0] * edge2[:,1] - edge1[:,1] * edge2[:,0] > 0).all()
+    assert get_front_face(instances) == ("cw" if iterations % 2 else "ccw")
+    layout = save_buffers('/tmp/spectre_tests_buffers', {'instances': get_front_face(instances)}, instances=instances)
+    assert layout['instances']['front_face'] == get_front_face(instances)
+    print('BUFFERS ITERATIONS:', iterations, 'tiles:', len(instances), 'ok')
+
+def test_svg(a=10.0, b=10.0, iterations=3, fileName='/tmp/spectre_tests_{}.svg'):
+    import drawsvg
+    import filecmp
+    from spectre import get_tile_colors, get_spectre_points, LABEL_CODES
+    from spectre_svg import save_svg
+    from spectre_tiles_drow import flattenPts
+    x = buildSpectreTiles(iterations,a,b)
+    transformations, label_codes, supertile_codes = flattenTiles(x["Delta"])
+    angles, color_arrays = get_tile_colors(transformations, label_codes, supertile_codes)
+    shapes = [drawsvg.Lines(*flattenPts(get_spectre_points(a, b)), close=True), drawsvg.Lines(*flattenPts(get_spectre_points(b, a)), close=True)]
+    shape_codes = (label_codes == LABEL_CODES["Gamma2"]).astype(int)
+    view_box = (-500, -500, 1000, 1000)
+    svgContens = drawsvg.Drawing(view_box[2], view_box[3])
+    svgContens.view_box = view_box
+    for T, code, angle, rgb in zip(transformations, shape_codes, angles, color_arrays):
+        svgContens.append(drawsvg.Use(shapes[code], 0, 0, transform=f"translate({T[0,2]},{T[1,2]}) rotate({angle}) scale(1,-1)",
+            fill=f"rgb({rgb[0]}, {rgb[1]}, {rgb[2]})", fill_opacity=0.6, stroke="gray", stroke_width=0.1 if rgb.any() else 0))
+    svgContens.save_svg(fileName.format('drawsvg'))
+    save_svg(fileName.format('serial'), shapes, shape_codes, transformations, angles, color_arrays, view_box, -1, processes=1)
+    save_svg(fileName.format('parallel'), shapes, shape_codes, transformations, angles, color_arrays, view_box, -1, processes=2, chunk_size=100)
+    assert filecmp.cmp(fileName.format('drawsvg'), fileName.format('serial'), shallow=False)
+    assert filecmp.cmp(fileName.format('serial'), fileName.format('parallel'), shallow=False)
+    print('SVG ITERATIONS:', iterations, 'tiles:', len(transformations), 'ok')
+
+def test_symbol_svg(a=10.0, b=10.0, iterations=3, fileName='/tmp/spectre_tests_symbol.svg'):
+    import re
+    import drawsvg
+    from spectre import get_tile_colors, get_spectre_points, mul
+    from spectre_svg import save_symbol_svg
+    from spectre_tiles_drow import flattenPts
+    x = buildSpectreTiles(iterations,a,b)
+    transformations, label_codes, supertile_codes = flattenTiles(x["Delta"])
+    shapes = [drawsvg.Lines(*flattenPts(get_spectre_points(a, b)), close=True), drawsvg.Lines(*flattenPts(get_spectre_points(b, a)), close=True)]
+    for scheme in ("rotation", "level", "label"):
+        _angles, color_arrays = get_tile_colors(transformations, label_codes, supertile_codes, scheme)
+        assert save_symbol_svg(fileName, x["Delta"], shapes, (-500, -500, 1000, 1000), scheme) == len(transformations)
+        with open(fileName) as f:
+            svg = f.read()
+        # expand the symbols back to the Tiles
+        symbols = {symbol_id: re.findall(r'<use xlink:href="#([^"]+)" transform="matrix\(([^)]*)\)"(?: fill="rgb\((\d+), (\d+), (\d+)\)")?', body)
+                   for symbol_id, body in re.findall(r'<symbol id="([^"]+)" overflow="visible">\n(.*?)</symbol>', svg, re.S)}
+        tiles = []
+        def expand(symbol_id, T):
+            for use_id, matrix, *rgb in symbols[symbol_id]:
+                child_T = mul(T, np.array([float(v) for v in matrix.split()]).reshape(3, 2).T)
+                if use_id in symbols:
+                    expand(use_id, child_T)
+                else:
+                    tiles.append((child_T, [int(v) for v in rgb]))
+        expand(re.search(r'</symbol>\n<use xlink:href="#([^"]+)" />\n</svg>$', svg).group(1), np.array([[1.,0,0],[0,1,0]]))
+        assert len(symbols) <= 24 * len(TILE_NAMES) * (iterations + 1)
+        assert np.allclose([T for T, _ in tiles], transformations, atol=1e-6)
+        assert ([rgb for _, rgb in tiles] == color_arrays).all()
+        print('SYMBOL SVG ITERATIONS:', iterations, 'scheme:', scheme, 'symbols:', len(symbols), 'tiles:', len(tiles), 'ok')
+
+def test_sweep(iterations=3, ratios=((10.0, 10.0), (7.3, 12.7), (2.0, 18.0))):
+    from spectre import get_spectre_points, LABEL_CODES
+    from spectre_sweep import get_ratio_coefficients, sweep_vertices
+    from spectre import get_transformation_range
+    import spectre
+    buildSpectreTiles(iterations,10.0,10.0)
+    saved_range, saved_tiling, saved_points = get_transformation_range(), spectre.last_tiling, spectre.SPECTRE_POINTS
+    coefficients, _label_codes, _color_arrays = get_ratio_coefficients(iterations)
+    # the module state of buildSpectreTiles is unchanged
+    assert get_transformation_range() == saved_range and spectre.last_tiling is saved_tiling and spectre.SPECTRE_POINTS is saved_points
+    for (a, b), vertices in zip(ratios, sweep_vertices(coefficients, ratios)):
+        transformations, label_codes, _supertile_codes = flattenTiles(buildSpectreTiles(iterations,a,b)["Delta"])
+        outlines = np.where((label_codes == LABEL_CODES["Gamma2"])[:,None,None], get_spectre_points(b, a), get_spectre_points(a, b))
+        expected = np.einsum('nij,nkj->nki', transformations[:,:,:2], outlines) + transformations[:,None,:,2]
+        assert np.allclose(vertices, expected, atol=1e-3)
+    print('SWEEP ITERATIONS:', iterations, 'ratios:', len(ratios), 'ok')
+
+def test_tiling(a=10.0, b=10.0, steps=(1,2,3,4)):
+    from spectre import SpectreTiling
+    tiling = SpectreTiling(a, b)
+    for iterations in steps:
+        x = tiling.deepen_to(iterations)
+        tiles = []
+        x["Delta"].forEachTile(lambda T, label: tiles.append(T))
+        translations = np.array(tiles)[:,:,2]
+        margin = a * 3 + b * 3
+        assert tiling.get_transformation_range(iterations) == (
+            int(np.floor(translations[:,0].min() - margin)), int(np.floor(translations[:,1].min() - margin)),
+            int(np.ceil(translations[:,0].max() + margin)), int(np.ceil(translations[:,1].max() + margin)))
+        flattened = tiling.flatten(addresses=True)
+        expected = flattenTiles(x["Delta"], addresses=True)
+        assert np.allclose(flattened[0], expected[0], atol=1e-6)
+        for array, expected_array in zip(flattened[1:], expected[1:]):
+            assert (array == expected_array).all()
+        print('TILING ITERATIONS:', iterations, 'tiles:', len(tiles), 'ok')
+
 if __name__=='__main__':
     if '--quick' in sys.argv:
         test(steps=(1,2,3))
+        test_flatten(steps=(1,2,3))
+        test_tiling(steps=(1,2,3))
+        test_addresses()
+        test_validate()
+        test_buffers()
+        test_svg()
+        test_symbol_svg()
+        test_sweep()
     else:
-        test()
\ No newline at end of file
+        test()
+        test_flatten()
+        test_tiling()
+        test_addresses()
+        test_validate()
+        test_buffers()
+        test_svg()
+        test_symbol_svg()
+        test_sweep()
\ No newline at end of file
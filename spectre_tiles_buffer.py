@@ -0,0 +1,160 @@
+# export tiles as GPU vertex/index buffers #####
+import sys
+import json
+from time import time
+import numpy as np
+import spectre
+from spectre import buildSpectreTiles, flattenTiles, get_tile_colors, get_spectre_points, Edge_a, Edge_b, N_ITERATIONS, LABEL_CODES, get_color_scheme_option
+
+# interleaved vertex: position x, y float32 and RGBA8 color packed into 4 bytes
+VERTEX_DTYPE = np.dtype([('position', '<f4', 2), ('color', '<u4')])
+# per tile instance: affine matrix(a b c d e f) float32, RGBA8 color and shape index (0: spectre, 1: mystic)
+INSTANCE_DTYPE = np.dtype([('transform', '<f4', 6), ('color', '<u4'), ('shape', '<u4')])
+
+def triangulate_polygon(points):
+    """
+    ear clipping triangulation of a simple polygon.
+    points: (n,2) polygon vertices
+    returns (n-2,3) uint32 vertex indices of counter-clockwise triangles
+    """
+    pts = np.asarray(points, np.float64)
+    x, y = pts[:,0], pts[:,1]
+    remaining = list(range(len(pts)))
+    if np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)) < 0: # clockwise
+        remaining.reverse()
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    triangles = []
+    while len(remaining) > 3:
+        for k in range(len(remaining)):
+            i0, i1, i2 = remaining[k - 1], remaining[k], remaining[(k + 1) % len(remaining)]
+            p0, p1, p2 = pts[i0], pts[i1], pts[i2]
+            if cross(p0, p1, p2) <= 1e-9: # reflex or collinear vertex is no ear
+                continue
+            if any(cross(p0, p1, pts[j]) >= -1e-9 and cross(p1, p2, pts[j]) >= -1e-9 and cross(p2, p0, pts[j]) >= -1e-9
+                   for j in remaining if j not in (i0, i1, i2)):
+                continue
+            triangles.append((i0, i1, i2))
+            del remaining[k]
+            break
+        else:
+            raise ValueError(f"triangulate_polygon: not a simple polygon {pts}")
+    triangles.append(tuple(remaining))
+    return np.array(triangles, np.uint32)
+
+def pack_colors(rgb, alpha=255):
+    """
+    rgb: (N,3) uint8 colors
+    returns (N,) uint32 RGBA8, byte order r, g, b, a in memory
+    """
+    rgb = np.asarray(rgb, np.uint32)
+    return rgb[:,0] | (rgb[:,1] << 8) | (rgb[:,2] << 16) | np.uint32(alpha << 24)
+
+def get_tile_buffers(tiles, edge_a, edge_b, scheme=None):
+    """
+    triangulate the spectre outline once and instance it per tile.
+    tiles: Tile or MetaTile to expand
+    returns memoryviews of (vertices VERTEX_DTYPE[N*14], indices uint32[N*12*3]), counter-clockwise triangles
+    """
+    transformations, label_codes, supertile_codes = flattenTiles(tiles)
+    _angles, color_arrays = get_tile_colors(transformations, label_codes, supertile_codes, scheme)
+    spectre_points = get_spectre_points(edge_a, edge_b)
+    mystic_points = get_spectre_points(edge_b, edge_a)
+    is_mystic = label_codes == LABEL_CODES["Gamma2"]
+    # the mystic outline is a different polygon unless edge_a == edge_b, triangulate each shape
+    spectre_triangles = triangulate_polygon(spectre_points)
+    mystic_triangles = triangulate_polygon(mystic_points)
+    n_points = len(spectre_points)
+
+    outlines = np.where(is_mystic[:,None,None], mystic_points, spectre_points) # (N,14,2)
+    vertices = np.empty((len(transformations), n_points), VERTEX_DTYPE)
+    vertices['position'] = np.einsum('nij,nkj->nki', transformations[:,:,:2], outlines) + transformations[:,None,:,2]
+    vertices['color'] = pack_colors(color_arrays)[:,None]
+    triangles = np.where(is_mystic[:,None,None], mystic_triangles, spectre_triangles) # (N,12,3)
+    # mirrored tiles (negative determinant, every tile of the odd iterations) turn the triangles clockwise
+    is_mirrored = np.linalg.det(transformations[:,:,:2]) < 0
+    triangles = np.where(is_mirrored[:,None,None], triangles[:,:,::-1], triangles)
+    indices = (triangles + np.arange(len(transformations), dtype=np.uint32)[:,None,None] * np.uint32(n_points))
+    return memoryview(vertices.reshape(-1)), memoryview(indices.reshape(-1))
+
+def get_instance_buffers(tiles, edge_a, edge_b, scheme=None):
+    """
+    base meshes of the spectre and the mystic outline, and per tile instance data.
+    tiles: Tile or MetaTile to expand
+    returns memoryviews of (vertices VERTEX_DTYPE[2*14], indices uint32[2*12*3], instances INSTANCE_DTYPE[N])
+    """
+    transformations, label_codes, supertile_codes = flattenTiles(tiles)
+    _angles, color_arrays = get_tile_colors(transformations, label_codes, supertile_codes, scheme)
+    spectre_points = get_spectre_points(edge_a, edge_b)
+    mystic_points = get_spectre_points(edge_b, edge_a)
+
+    vertices = np.zeros((2, len(spectre_points)), VERTEX_DTYPE)
+    vertices['position'] = (spectre_points, mystic_points)
+    vertices['color'] = pack_colors([(255, 255, 255)])
+    indices = np.stack([triangulate_polygon(spectre_points), triangulate_polygon(mystic_points) + np.uint32(len(spectre_points))])
+
+    instances = np.empty(len(transformations), INSTANCE_DTYPE)
+    instances['transform'] = transformations.transpose(0, 2, 1).reshape(-1, 6) # column-major, as svg matrix(a b c d e f)
+    instances['color'] = pack_colors(color_arrays)
+    instances['shape'] = label_codes == LABEL_CODES["Gamma2"]
+    return memoryview(vertices.reshape(-1)), memoryview(indices.reshape(-1)), memoryview(instances)
+
+def get_front_face(instances):
+    """
+    winding of the counter-clockwise base mesh triangles after the instance transforms:
+    "ccw", "cw" when every instance is mirrored (negative determinant), or "mixed"
+    """
+    a, b, c, d = np.asarray(instances)['transform'][:,:4].T
+    determinants = a * d - b * c
+    return "ccw" if (determinants > 0).all() else "cw" if (determinants < 0).all() else "mixed"
+
+def save_buffers(baseFileName, front_faces={}, **buffers):
+    """
+    write each buffer to <baseFileName>.<name>.bin without copying, and their layout to <baseFileName>.json
+    front_faces: buffer name -> triangle winding "ccw" or "cw", added to the layout of that buffer
+    """
+    layout = {}
+    for name, buffer in buffers.items():
+        fileName = f"{baseFileName}.{name}.bin"
+        with open(fileName, 'wb') as f:
+            f.write(buffer)
+        dtype = buffer.obj.dtype
+        layout[name] = {
+            'file': fileName,
+            'count': len(buffer),
+            'stride': buffer.itemsize,
+            'fields': {field: {'offset': offset, 'type': ftype.base.str, 'components': int(np.prod(ftype.shape))}
+                       for field, (ftype, offset) in dtype.fields.items()} if dtype.names else {'value': {'offset': 0, 'type': dtype.str, 'components': 1}}
+        }
+        if name in front_faces:
+            layout[name]['front_face'] = front_faces[name]
+    with open(f"{baseFileName}.json", 'w') as f:
+        json.dump(layout, f, indent=2)
+    return layout
+
+if __name__ == '__main__':
+    colorScheme = get_color_scheme_option(sys.argv)
+    start = time()
+    spectreTiles = buildSpectreTiles(N_ITERATIONS, Edge_a, Edge_b)
+    time1 = time()-start
+    print(f"supertiling loop took {round(time1, 4)} seconds")
+
+    start = time()
+    if '--instanced' in sys.argv:
+        vertices, indices, instances = get_instance_buffers(spectreTiles["Delta"], Edge_a, Edge_b, colorScheme)
+        num_tiles = len(instances)
+        buffers = {'vertices': vertices, 'indices': indices, 'instances': instances}
+        front_faces = {'instances': get_front_face(instances)}
+    else:
+        vertices, indices = get_tile_buffers(spectreTiles["Delta"], Edge_a, Edge_b, colorScheme)
+        num_tiles = len(vertices) // len(spectre.SPECTRE_POINTS)
+        buffers = {'vertices': vertices, 'indices': indices}
+        front_faces = {'indices': "ccw"}
+    saveFileName = f"spectre_tile{Edge_a:.1f}-{Edge_b:.1f}_{N_ITERATIONS}-{num_tiles}{'instances' if '--instanced' in sys.argv else 'mesh'}"
+    save_buffers(saveFileName, front_faces, **buffers)
+    time2 = time()-start
+    print(f"buffer export took {round(time2, 4)} seconds, generated {num_tiles} tiles")
+    print("buffer export save to " + saveFileName + ".json")
+    print(f"buffer export total processing time {round(time1+time2, 4)} seconds, {round(1000000*(time1+time2)/num_tiles, 4)} μs/tile")
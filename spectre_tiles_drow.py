@@ -1,43 +1,26 @@
 ## draw Polygons Svg by drawsvg #####
-from spectre import buildSpectreTiles,get_color_array,get_transformation_range, SPECTRE_POINTS, Mystic_SPECTRE_POINTS, Edge_a,Edge_b, N_ITERATIONS, print_trot_inv_prof, trot_inv
+from spectre import buildSpectreTiles,flattenTiles,get_tile_colors,get_transformation_range, SPECTRE_POINTS, Mystic_SPECTRE_POINTS, Edge_a,Edge_b, N_ITERATIONS, print_trot_inv_prof, get_color_scheme_option, LABEL_CODES
+from spectre_svg import save_svg, save_symbol_svg
+import sys
 from time import time
 import drawsvg
 
-start = time()
-spectreTiles = buildSpectreTiles(N_ITERATIONS,Edge_a,Edge_b)
-transformation_min_X, transformation_min_Y, transformation_max_X, transformation_max_Y = get_transformation_range()
-time1 = time()-start
-print(f"supertiling loop took {round(time1, 4)} seconds")
-print(f"transformation range (min_X, min_Y, max_X, max_Y) is {transformation_min_X}, {transformation_min_Y}, {transformation_max_X}, {transformation_max_Y}") 
-
-start = time()
 def flattenPts(lst): # drowsvg
     return [item for sublist in lst for item in sublist] # drowsvg
 
-SPECTRE_SHAPE = drawsvg.Lines(*flattenPts([p for p in SPECTRE_POINTS]), stroke="black", stroke_width=0.5,close=True) # drowsvg
-Mystic_SPECTRE_SHAPE = drawsvg.Lines(*flattenPts([p for p in Mystic_SPECTRE_POINTS]), stroke="black",   stroke_width=0.5, close=True) # drowsvg
-
-
-viewWidth = transformation_max_X - transformation_min_X
-viewHeight = transformation_max_Y - transformation_min_Y
-svgContens = drawsvg.Drawing(viewWidth, viewHeight) # @TODO: ajust to polygons X-Y min and max. 
-svgContens.view_box = (transformation_min_X , transformation_min_Y,viewWidth, viewHeight)
-SvgContens_drowSvg_transform_scaleY = svgContens_drowSvg_transform_scaleY = 1 if N_ITERATIONS % 2 == 0 else -1
-num_tiles = 0 # drowswvg
-def drawPolygon2Svg(T, label): #drowsvg
+def drawPolygon2Svg(T, label, degAngle, rgb): #drowsvg
     """
     T: transformation matrix
-    label: label of shape type
+    label: label code of shape type
+    degAngle: rotation angle of T
+    rgb: uint8 RGB color of the tile
     """
-    global num_tiles,svgContens,SvgContens_drowSvg_transform_scaleY
-    num_tiles += 1
-    color_array = get_color_array(T, label) # drowsvg
-    degAngle, _scaleY = trot_inv(T) 
+    global svgContens,SvgContens_drowSvg_transform_scaleY
     transform=f"translate({T[0,2]},{T[1,2]}) rotate({degAngle}) scale(1,{SvgContens_drowSvg_transform_scaleY})"
-    fill = f"rgb({int(round(color_array[0]* 255, 0))}, {int(round(color_array[1]* 255,0))}, {int(round(color_array[2]* 255,0))})"
+    fill = f"rgb({rgb[0]}, {rgb[1]}, {rgb[2]})"
     stroke_f = "gray" # tile stroke color
-    stroke_w = 0.1 if (fill[0] != 0) | (fill[1] != 0) | (fill[2] != 0) else 0 # tile stroke width
-    shape = SPECTRE_SHAPE if label != "Gamma2" else Mystic_SPECTRE_SHAPE  # geometric points used.
+    stroke_w = 0.1 if rgb.any() else 0 # tile stroke width
+    shape = SPECTRE_SHAPE if label != LABEL_CODES["Gamma2"] else Mystic_SPECTRE_SHAPE  # geometric points used.
     # print(f"transform-matrix,{T[0,0]},{T[1,0]},{T[0,1]},{T[1,1]},{T[0,2]},{T[1,2]}")
 
     svgContens.append(drawsvg.Use(
@@ -54,11 +37,49 @@ def drawPolygon2Svg(T, label): #drowsvg
     #     color="gray"
     # ))
 
-spectreTiles["Delta"].forEachTile(drawPolygon2Svg) # updates num_tiles
-saveFileName = f"spectre_tile{Edge_a:.1f}-{Edge_b:.1f}_{N_ITERATIONS}-{num_tiles}useRef.svg"
-svgContens.save_svg(saveFileName)
-time4 = time()-start
-print(f"drowsvg: SVG drawing took {round(time4, 4)} seconds, generated {num_tiles} tiles")
-print_trot_inv_prof()
-print("drowsvg: drawPolygon save to " + saveFileName)
-print(f"drowsvg: total processing time {round(time1+time4, 4)} seconds, {round(1000000*(time1+time4)/num_tiles, 4)} μs/tile")
+if __name__ == '__main__':
+    colorScheme = get_color_scheme_option(sys.argv)
+    start = time()
+    spectreTiles = buildSpectreTiles(N_ITERATIONS,Edge_a,Edge_b)
+    transformation_min_X, transformation_min_Y, transformation_max_X, transformation_max_Y = get_transformation_range()
+    time1 = time()-start
+    print(f"supertiling loop took {round(time1, 4)} seconds")
+    print(f"transformation range (min_X, min_Y, max_X, max_Y) is {transformation_min_X}, {transformation_min_Y}, {transformation_max_X}, {transformation_max_Y}") 
+
+    start = time()
+    SPECTRE_SHAPE = drawsvg.Lines(*flattenPts([p for p in SPECTRE_POINTS]), stroke="black", stroke_width=0.5,close=True) # drowsvg
+    Mystic_SPECTRE_SHAPE = drawsvg.Lines(*flattenPts([p for p in Mystic_SPECTRE_POINTS]), stroke="black",   stroke_width=0.5, close=True) # drowsvg
+
+
+    viewWidth = transformation_max_X - transformation_min_X
+    viewHeight = transformation_max_Y - transformation_min_Y
+    svgContens = drawsvg.Drawing(viewWidth, viewHeight) # @TODO: ajust to polygons X-Y min and max. 
+    svgContens.view_box = (transformation_min_X , transformation_min_Y,viewWidth, viewHeight)
+    SvgContens_drowSvg_transform_scaleY = svgContens_drowSvg_transform_scaleY = 1 if N_ITERATIONS % 2 == 0 else -1
+
+    flatSvg = '--flat' in sys.argv or '--drawsvg' in sys.argv
+    if flatSvg or '--validate' in sys.argv:
+        tile_transformations, label_codes, supertile_codes = flattenTiles(spectreTiles["Delta"])
+    if '--validate' in sys.argv: # validation does not change the SVG output
+        from spectre_validate import validate_tiling, print_validation
+        print_validation(validate_tiling(tile_transformations, label_codes, Edge_a, Edge_b))
+    if not flatSvg: # one <symbol> per MetaTile, only the root is used
+        saveFileName = f"spectre_tile{Edge_a:.1f}-{Edge_b:.1f}_{N_ITERATIONS}symbol.svg"
+        num_tiles = save_symbol_svg(saveFileName, spectreTiles["Delta"], [SPECTRE_SHAPE, Mystic_SPECTRE_SHAPE], svgContens.view_box, colorScheme)
+    else:
+        degAngles, color_arrays = get_tile_colors(tile_transformations, label_codes, supertile_codes, colorScheme)
+        num_tiles = len(tile_transformations)
+        saveFileName = f"spectre_tile{Edge_a:.1f}-{Edge_b:.1f}_{N_ITERATIONS}-{num_tiles}useRef.svg"
+        if '--drawsvg' in sys.argv: # one drawsvg.Use per tile
+            for T, label, degAngle, rgb in zip(tile_transformations, label_codes, degAngles, color_arrays):
+                drawPolygon2Svg(T, label, degAngle, rgb)
+            svgContens.save_svg(saveFileName)
+        else: # chunks of <use> formatted in parallel, same output
+            save_svg(saveFileName, [SPECTRE_SHAPE, Mystic_SPECTRE_SHAPE], (label_codes == LABEL_CODES["Gamma2"]).astype(int),
+                     tile_transformations, degAngles, color_arrays, svgContens.view_box, SvgContens_drowSvg_transform_scaleY)
+    time4 = time()-start
+    print(f"drowsvg: SVG drawing took {round(time4, 4)} seconds, generated {num_tiles} tiles")
+    if flatSvg:
+        print_trot_inv_prof()
+    print("drowsvg: drawPolygon save to " + saveFileName)
+    print(f"drowsvg: total processing time {round(time1+time4, 4)} seconds, {round(1000000*(time1+time4)/num_tiles, 4)} μs/tile")
@@ -1,5 +1,6 @@
 # draw Polygons Svg by matplotlib #####
-from spectre import buildSpectreTiles,get_color_array, SPECTRE_POINTS, Mystic_SPECTRE_POINTS, Edge_a,Edge_b, N_ITERATIONS, print_trot_inv_prof
+from spectre import buildSpectreTiles,flattenTiles,get_tile_colors, SPECTRE_POINTS, Mystic_SPECTRE_POINTS, Edge_a,Edge_b, N_ITERATIONS, print_trot_inv_prof, get_color_scheme_option, LABEL_CODES
+import sys
 from time import time
 import matplotlib.pyplot as plt
 
@@ -13,21 +14,22 @@ start = time()
 plt.figure(figsize=(8, 8))
 plt.axis('equal')
 
-num_tiles = 0
-def plotVertices(tile_transformation, label):
+def plotVertices(tile_transformation, label, rgb):
     """
     T: transformation matrix
-    label: label of shape type
+    label: label code of shape type
+    rgb: uint8 RGB color of the tile
     """
-    global num_tiles
-    num_tiles += 1
-    vertices = (SPECTRE_POINTS if label != "Gamma2" else Mystic_SPECTRE_POINTS).dot(tile_transformation[:,:2].T) + tile_transformation[:,2]
-    color_array = get_color_array(tile_transformation, label)
+    vertices = (SPECTRE_POINTS if label != LABEL_CODES["Gamma2"] else Mystic_SPECTRE_POINTS).dot(tile_transformation[:,:2].T) + tile_transformation[:,2]
     # plt.text((vertices[1,0] + vertices[7,0])/2, (vertices[1,1] + vertices[7,1])/2, label, fontsize=8, color='gray')
-    plt.fill(vertices[:,0],vertices[:,1],facecolor=color_array)
+    plt.fill(vertices[:,0],vertices[:,1],facecolor=rgb / 255.)
     plt.plot(vertices[:,0],vertices[:,1],color='gray',linewidth=0.2)
 
-spectreTiles["Delta"].forEachTile(plotVertices)
+tile_transformations, label_codes, supertile_codes = flattenTiles(spectreTiles["Delta"])
+_angles, color_arrays = get_tile_colors(tile_transformations, label_codes, supertile_codes, get_color_scheme_option(sys.argv))
+for tile_transformation, label, rgb in zip(tile_transformations, label_codes, color_arrays):
+    plotVertices(tile_transformation, label, rgb)
+num_tiles = len(tile_transformations)
 time2 = time()-start
 print(f"matplotlib.pyplot: tile recursion loop took {round(time2, 4)} seconds, generated {num_tiles} tiles")
 print_trot_inv_prof()
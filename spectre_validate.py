@@ -0,0 +1,240 @@
+# validate tilings: overlaps, gaps and area #####
+import sys
+from time import time
+import numpy as np
+from spectre import buildSpectreTiles, flattenTiles, get_spectre_points, Edge_a, Edge_b, N_ITERATIONS, LABEL_CODES
+from spectre_tiles_buffer import triangulate_polygon
+
+def polygon_areas(polygons):
+    """
+    polygons: (N,n,2) vertices
+    returns (N,) unsigned shoelace areas
+    """
+    x, y = polygons[...,0], polygons[...,1]
+    return 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=-1) - y * np.roll(x, -1, axis=-1), axis=-1))
+
+def point_segment_distances(points, starts, ends):
+    """
+    distances of (..., p, 1, 2) points to (..., 1, e, 2) segments
+    """
+    edges = ends - starts
+    t = np.clip(np.sum((points - starts) * edges, axis=-1) / np.sum(edges * edges, axis=-1), 0.0, 1.0)
+    return np.linalg.norm(points - (starts + t[...,None] * edges), axis=-1)
+
+def points_strictly_inside(points, polygon, tol):
+    """
+    points inside polygon and farther than tol from its outline
+    """
+    starts = polygon[None,:,:]
+    ends = np.roll(polygon, -1, axis=0)[None,:,:]
+    px, py = points[:,None,0], points[:,None,1]
+    # crossing number
+    crosses = ((starts[...,1] > py) != (ends[...,1] > py)) & \
+        (px < starts[...,0] + (py - starts[...,1]) * (ends[...,0] - starts[...,0]) / (ends[...,1] - starts[...,1] + (ends[...,1] == starts[...,1])))
+    inside = np.count_nonzero(crosses, axis=1) % 2 == 1
+    return inside & (point_segment_distances(points[:,None,:], starts, ends).min(axis=1) > tol)
+
+def test_pair(polygon_a, anchor_a, polygon_b, anchor_b, tol):
+    """
+    polygon_a, polygon_b: (n,2) outlines in the same frame
+    returns (interiors overlap, (n,) edges of a shared with b, (n,) edges of b shared with a)
+    """
+    a0, a1 = polygon_a, np.roll(polygon_a, -1, axis=0)
+    b0, b1 = polygon_b, np.roll(polygon_b, -1, axis=0)
+
+    def side(p0, p1, q): # signed distance of q from the line p0 -> p1
+        d = p1 - p0
+        return (d[...,0] * (q[...,1] - p0[...,1]) - d[...,1] * (q[...,0] - p0[...,0])) / np.linalg.norm(d, axis=-1)
+    # proper crossings of the edges of a (rows) and b (columns)
+    s1 = side(b0[None], b1[None], a0[:,None])
+    s2 = side(b0[None], b1[None], a1[:,None])
+    s3 = side(a0[:,None], a1[:,None], b0[None])
+    s4 = side(a0[:,None], a1[:,None], b1[None])
+    crossing = (((s1 > tol) & (s2 < -tol)) | ((s1 < -tol) & (s2 > tol))) & (((s3 > tol) & (s4 < -tol)) | ((s3 < -tol) & (s4 > tol)))
+    overlap = crossing.any() or \
+        points_strictly_inside(np.vstack([polygon_a, anchor_a]), polygon_b, tol).any() or \
+        points_strictly_inside(np.vstack([polygon_b, anchor_b]), polygon_a, tol).any()
+
+    # an edge is shared when the other polygon has an edge with the same end points
+    same = (np.linalg.norm(a0[:,None] - b0[None], axis=-1) < tol) & (np.linalg.norm(a1[:,None] - b1[None], axis=-1) < tol)
+    reversed = (np.linalg.norm(a0[:,None] - b1[None], axis=-1) < tol) & (np.linalg.norm(a1[:,None] - b0[None], axis=-1) < tol)
+    shared = same | reversed
+    return overlap, shared.any(axis=1), shared.any(axis=0)
+
+def get_candidate_pairs(anchors, cell_size, chunk_size=100000):
+    """
+    uniform grid spatial hash of the anchors, yields chunks of (i, j) pairs in the same or adjacent cells
+    """
+    cells = np.floor(anchors / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    width = cells[:,1].max() + 3
+    keys = cells[:,0] * width + cells[:,1] + 1
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    for chunk in range(0, len(keys), chunk_size):
+        positions = np.arange(chunk, min(chunk + chunk_size, len(keys)))
+        i_list, j_list = [], []
+        # half of the 3x3 neighbourhood, each pair once
+        for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+            targets = sorted_keys[positions] + dx * width + dy
+            starts = np.searchsorted(sorted_keys, targets, 'left')
+            ends = np.searchsorted(sorted_keys, targets, 'right')
+            if dx == 0 and dy == 0:
+                starts = positions + 1
+            counts = np.maximum(ends - starts, 0)
+            i_list.append(np.repeat(positions, counts))
+            j_list.append(np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum()))
+        yield order[np.concatenate(i_list)], order[np.concatenate(j_list)]
+
+def get_boundary_loops(starts, ends, tol):
+    """
+    connected components of the unmatched edges, joining end points closer than tol
+    returns (E,) component index of each edge
+    """
+    parent = list(range(len(starts)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    points = np.concatenate([starts, ends])
+    edge_ids = np.concatenate([np.arange(len(starts))] * 2)
+    # quantize with 4 shifted grids, so end points closer than tol share a cell in one of them
+    for shift in ((0, 0), (0.5, 0), (0, 0.5), (0.5, 0.5)):
+        cells = np.floor(points / (4 * tol) + shift).astype(np.int64)
+        cells -= cells.min(axis=0)
+        _unique, groups = np.unique(cells[:,0] * (cells[:,1].max() + 1) + cells[:,1], return_inverse=True)
+        first_edge = {}
+        for group, edge in zip(groups.reshape(-1).tolist(), edge_ids.tolist()):
+            if group in first_edge:
+                root_a, root_b = find(first_edge[group]), find(edge)
+                if root_a != root_b:
+                    parent[root_a] = root_b
+            else:
+                first_edge[group] = edge
+    return np.array([find(i) for i in range(len(starts))], np.intp)
+
+def validate_tiling(transformations, label_codes, edge_a, edge_b, tolerance=1e-3):
+    """
+    check that the tiles are overlap-free and gap-free, that each tile has the area of its outline,
+    and that the tile area sum is the area enclosed by the outer boundary loop of the patch within
+    half a tile, which also fails for one overlapping tile or enclosed gap at any patch size.
+    Pairs of nearby tiles come from a uniform grid spatial hash. A tiling has few distinct neighbour
+    configurations (relative rotation and translation), so each configuration is tested only once.
+    transformations, label_codes: flattenTiles arrays
+    tolerance: relative to the longest edge, and to the tile area
+    returns a dict of the check results and the offending tile indices
+    """
+    if len(transformations) == 0:
+        return {'tiles': 0, 'configurations': 0, 'area': 0.0, 'expected_area': 0.0,
+                'area_errors': np.zeros(0, np.intp), 'area_ok': True, 'overlaps': np.zeros((0, 2), np.intp),
+                'gaps': np.zeros(0, np.intp), 'boundary_edges': 0, 'valid': True}
+    tol = tolerance * max(edge_a, edge_b)
+    outlines = np.stack([get_spectre_points(edge_a, edge_b), get_spectre_points(edge_b, edge_a)]).astype(np.float64)
+    shapes = (label_codes == LABEL_CODES["Gamma2"]).astype(np.intp)
+    rotations = transformations[:,:,:2]
+    translations = transformations[:,:,2]
+    polygons = np.einsum('nij,nkj->nki', rotations, outlines[shapes]) + translations[:,None,:]
+
+    # area
+    areas = polygon_areas(polygons - translations[:,None,:]) # relative to each tile, exact at large coordinates
+    expected_areas = polygon_areas(outlines)[shapes]
+    area_errors = np.flatnonzero(np.abs(areas - expected_areas) > tolerance * expected_areas)
+
+    # local anchor points inside the outlines, the largest triangle centroid
+    anchors_local = []
+    for outline in outlines:
+        triangles = outline[triangulate_polygon(outline)]
+        anchors_local.append(triangles[np.argmax(polygon_areas(triangles))].mean(axis=0))
+    anchors_local = np.array(anchors_local)
+    anchors = np.einsum('nij,nj->ni', rotations, anchors_local[shapes]) + translations
+    radius = max(np.linalg.norm(outline - anchor, axis=1).max() for outline, anchor in zip(outlines, anchors_local))
+
+    # neighbour pairs, grouped by configuration
+    configurations = {}
+    translation_range = int(np.ceil((2 * radius + tol) / tol)) + 1
+    overlaps = []
+    shared_edges = np.zeros(len(transformations), np.uint32)
+    edge_bits = np.uint32(1) << np.arange(outlines.shape[1], dtype=np.uint32)
+    for i, j in get_candidate_pairs(anchors, 2 * radius + tol):
+        near = np.linalg.norm(anchors[i] - anchors[j], axis=1) < 2 * radius + tol
+        i, j = i[near], j[near]
+        # pose of j in the frame of i, rotations are orthogonal
+        relative_rotations = np.einsum('nji,njk->nik', rotations[i], rotations[j])
+        relative_translations = np.einsum('nji,nj->ni', rotations[i], translations[j] - translations[i])
+        # configuration key packed into one int64: shapes, relative rotation in 30 degree steps,
+        # reflection and the relative translation quantized by tol
+        angles = np.rint(np.rad2deg(np.arctan2(relative_rotations[:,1,0], relative_rotations[:,0,0])) / 30).astype(np.int64) % 12
+        reflections = (relative_rotations[:,0,0] * relative_rotations[:,1,1] - relative_rotations[:,0,1] * relative_rotations[:,1,0] < 0)
+        offsets = np.rint(relative_translations / tol).astype(np.int64) + translation_range
+        keys = ((((shapes[i] * 2 + shapes[j]) * 12 + angles) * 2 + reflections) * (2 * translation_range + 1) + offsets[:,0]) * (2 * translation_range + 1) + offsets[:,1]
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        results = []
+        for key, k in zip(unique_keys.tolist(), first):
+            if key not in configurations:
+                polygon_b = outlines[shapes[j[k]]] @ relative_rotations[k].T + relative_translations[k]
+                anchor_b = relative_rotations[k] @ anchors_local[shapes[j[k]]] + relative_translations[k]
+                overlap, shared_a, shared_b = test_pair(outlines[shapes[i[k]]], anchors_local[shapes[i[k]]], polygon_b, anchor_b, tol)
+                configurations[key] = (overlap, np.bitwise_or.reduce(edge_bits[shared_a]), np.bitwise_or.reduce(edge_bits[shared_b]))
+            results.append(configurations[key])
+        overlap, mask_a, mask_b = (np.array(column) for column in zip(*results)) if results else (np.zeros(0, bool),) * 3
+        inverse = inverse.reshape(-1)
+        overlaps.append(np.column_stack([i, j])[overlap[inverse]] if len(inverse) else np.zeros((0, 2), np.intp))
+        if len(inverse):
+            np.bitwise_or.at(shared_edges, i, mask_a[inverse].astype(np.uint32))
+            np.bitwise_or.at(shared_edges, j, mask_b[inverse].astype(np.uint32))
+    overlaps = np.concatenate(overlaps) if overlaps else np.zeros((0, 2), np.intp)
+
+    # gaps: unshared edges form the outer boundary loop, any other loop encloses a gap
+    tiles, edges = np.nonzero((shared_edges[:,None] & edge_bits) == 0)
+    starts = polygons[tiles, edges]
+    ends = polygons[tiles, (edges + 1) % outlines.shape[1]]
+    gaps = np.zeros(0, np.intp)
+    boundary_area = 0.0
+    if len(tiles):
+        loops = get_boundary_loops(starts, ends, tol)
+        outer_loop = loops[np.lexsort((starts[:,1], starts[:,0]))[0]]
+        gaps = np.unique(tiles[loops != outer_loop])
+        # shoelace over the outer loop edges relative to the patch center, each edge oriented with its tile
+        orientations = np.sign(np.linalg.det(rotations))[tiles]
+        is_outer = loops == outer_loop
+        center = starts[is_outer].mean(axis=0)
+        x0, y0 = (starts - center).T
+        x1, y1 = (ends - center).T
+        boundary_area = float(0.5 * abs(np.sum((orientations * (x0 * y1 - y0 * x1))[is_outer])))
+
+    # absolute tolerance of half a tile, one missing or extra tile fails at any patch size
+    area_ok = bool(abs(areas.sum() - boundary_area) <= 0.5 * expected_areas.min())
+    return {
+        'tiles': len(transformations),
+        'configurations': len(configurations),
+        'area': float(areas.sum()),
+        'expected_area': boundary_area,
+        'area_errors': area_errors,
+        'area_ok': area_ok,
+        'overlaps': overlaps,
+        'gaps': gaps,
+        'boundary_edges': len(tiles),
+        'valid': area_ok and len(area_errors) == 0 and len(overlaps) == 0 and len(gaps) == 0
+    }
+
+def print_validation(report):
+    print(f"validate: {report['tiles']} tiles, {report['configurations']} neighbour configurations, {report['boundary_edges']} boundary edges")
+    print(f"validate: area {report['area']:.6g}, outer boundary area {report['expected_area']:.6g}, tiles with wrong area {report['area_errors'][:20]}")
+    print(f"validate: overlapping tile pairs {report['overlaps'][:20].tolist()}")
+    print(f"validate: tiles around gaps {report['gaps'][:20]}")
+    print(f"validate: {'valid' if report['valid'] else 'INVALID'} tiling")
+
+if __name__ == '__main__':
+    start = time()
+    spectreTiles = buildSpectreTiles(N_ITERATIONS, Edge_a, Edge_b)
+    transformations, label_codes, _supertile_codes = flattenTiles(spectreTiles["Delta"])
+    time1 = time()-start
+    print(f"supertiling loop took {round(time1, 4)} seconds")
+
+    start = time()
+    report = validate_tiling(transformations, label_codes, Edge_a, Edge_b)
+    time2 = time()-start
+    print_validation(report)
+    print(f"validate took {round(time2, 4)} seconds, {round(1000000*time2/len(transformations), 4)} μs/tile")
+    sys.exit(0 if report['valid'] else 1)
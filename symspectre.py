@@ -1,7 +1,17 @@
+import os
+import sys
+import pickle
+import hashlib
+import inspect
+from multiprocessing import Pool
 import sympy as sp
 
 # Define symbolic variables
 n_ITERATIONS = 2  # Number of iterations to build supertiles
+ROTATION = 30  # rotation of Gamma2 in the Gamma tile
+N_PROCESSES = os.cpu_count()  # worker processes for the leaf expansion, 1 to run serially
+CACHE_DIR = './tmp/symspectre_cache'  # symbolic supertile transformations per level, None to disable
+LATEX_FILE = './tmp/einsteintile.tex'
 Edge_a, Edge_b = sp.symbols('Edge_a Edge_b')
 a = Edge_a
 b = Edge_b
@@ -121,6 +131,18 @@ def buildSpectreBase_sympy(spectre_points_all, rotation=30):
     return tiles
 
 
+SUBSTITUTIONS = {
+    "Gamma": ("Pi", "Delta", None, "Theta", "Sigma", "Xi", "Phi", "Gamma"),
+    "Delta": ("Xi", "Delta", "Xi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
+    "Theta": ("Psi", "Delta", "Pi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
+    "Lambda": ("Psi", "Delta", "Xi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
+    "Xi": ("Psi", "Delta", "Pi", "Phi", "Sigma", "Psi", "Phi", "Gamma"),
+    "Pi": ("Psi", "Delta", "Xi", "Phi", "Sigma", "Psi", "Phi", "Gamma"),
+    "Sigma": ("Xi", "Delta", "Xi", "Phi", "Sigma", "Pi", "Lambda", "Gamma"),
+    "Phi": ("Psi", "Delta", "Psi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
+    "Psi": ("Psi", "Delta", "Psi", "Phi", "Sigma", "Psi", "Phi", "Gamma")
+}
+
 def buildSupertiles_sympy(input_tiles):
     """
     Iteratively build supertiles using symbolic transformations.
@@ -169,21 +191,8 @@ def buildSupertiles_sympy(input_tiles):
         [super_quad_points[3][0], super_quad_points[3][1]]
     ]))
     
-    # ... (rest of the code remains the same)
-    substitutions_map = {
-        "Gamma": ("Pi", "Delta", None, "Theta", "Sigma", "Xi", "Phi", "Gamma"),
-        "Delta": ("Xi", "Delta", "Xi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
-        "Theta": ("Psi", "Delta", "Pi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
-        "Lambda": ("Psi", "Delta", "Xi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
-        "Xi": ("Psi", "Delta", "Pi", "Phi", "Sigma", "Psi", "Phi", "Gamma"),
-        "Pi": ("Psi", "Delta", "Xi", "Phi", "Sigma", "Psi", "Phi", "Gamma"),
-        "Sigma": ("Xi", "Delta", "Xi", "Phi", "Sigma", "Pi", "Lambda", "Gamma"),
-        "Phi": ("Psi", "Delta", "Psi", "Phi", "Sigma", "Pi", "Phi", "Gamma"),
-        "Psi": ("Psi", "Delta", "Psi", "Phi", "Sigma", "Psi", "Phi", "Gamma")
-    }
-
     new_tiles = {}
-    for label, substitutions in substitutions_map.items():
+    for label, substitutions in SUBSTITUTIONS.items():
         sub_tiles = [input_tiles[subst] for subst in substitutions if subst]
         sub_transformations = [trsf for subst, trsf in zip(substitutions, transformations) if subst]
         new_tiles[label] = MetaTile(
@@ -193,42 +202,127 @@ def buildSupertiles_sympy(input_tiles):
         )
     return new_tiles
 
-# Example usage to demonstrate a single step
-
+def get_cache_hash():
+    """
+    content hash of the inputs of the cached levels: the base points, the substitution table
+    and the code building the levels, so a change never loads stale pickles
+    """
+    inputs = [repr(get_spectre_points_sympy(Edge_a, Edge_b)), repr(SUBSTITUTIONS)]
+    inputs += [inspect.getsource(function) for function in (buildSpectreBase_sympy, buildSupertiles_sympy, mul_sympy, trot_sympy)]
+    return hashlib.sha1("\n".join(inputs).encode('utf-8')).hexdigest()[:12]
 
-# Corrected main execution block
-SPECTRE_POINTS_SYM = get_spectre_points_sympy(Edge_a, Edge_b)
-# SPECTRE_QUAD_SYM = sp.Matrix([SPECTRE_POINTS_SYM[3, :], SPECTRE_POINTS_SYM[5, :], SPECTRE_POINTS_SYM[7, :], SPECTRE_POINTS_SYM[11, :]])
-print("Spectre(Gamma1) points=", SPECTRE_POINTS_SYM)
-Mystec_SPECTRE_POINTS_SYM = get_spectre_points_sympy(Edge_b, Edge_a)
-# SPECTRE_QUAD_SYM = sp.Matrix([SPECTRE_POINTS_SYM[3, :], SPECTRE_POINTS_SYM[5, :], SPECTRE_POINTS_SYM[7, :], SPECTRE_POINTS_SYM[11, :]])
-print("Spectre(Gamma2) points=", Mystec_SPECTRE_POINTS_SYM)
+def buildSupertiles_sympy_cached(input_tiles, iteration, rotation=ROTATION, cache_dir=CACHE_DIR):
+    """
+    buildSupertiles_sympy, with the symbolic transformations of the level loaded from
+    or saved to <cache_dir>/supertiles_<iteration>_rot<rotation>_<get_cache_hash()>.pickle
+    """
+    if cache_dir is None:
+        return buildSupertiles_sympy(input_tiles)
+    cache_file = os.path.join(cache_dir, f"supertiles_{iteration}_rot{rotation}_{get_cache_hash()}.pickle")
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            level = pickle.load(f)
+        return {
+            label: MetaTile(
+                tiles=[input_tiles[subst] for subst in SUBSTITUTIONS[label] if subst],
+                transformations=transformations,
+                quad=quad
+            ) for label, (transformations, quad) in level.items()
+        }
+    tiles = buildSupertiles_sympy(input_tiles)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file + '.tmp', 'wb') as f:
+        pickle.dump({label: (tile.transformations, tile.quad) for label, tile in tiles.items()}, f)
+    os.replace(cache_file + '.tmp', cache_file)  # concurrent runs never read a partial file
+    return tiles
 
-# Pass the full points matrix, not the quad, to the function
-current_tiles_sympy = buildSpectreBase_sympy(SPECTRE_POINTS_SYM)
-# print(0,current_tiles_sympy)
+def buildSpectreTiles_sympy(n_iterations, rotation=ROTATION, cache_dir=CACHE_DIR):
+    """
+    Build the symbolic supertiles of n_iterations, reusing the cached levels.
+    """
+    tiles = buildSpectreBase_sympy(get_spectre_points_sympy(Edge_a, Edge_b), rotation)
+    for i in range(n_iterations):
+        tiles = buildSupertiles_sympy_cached(tiles, i + 1, rotation, cache_dir)
+    return tiles
 
-print("Built symbolic tiles for iteration ", n_ITERATIONS)
-# The rest of the code should now work without the IndexError
-for i in range(n_ITERATIONS):
-    current_tiles_sympy = buildSupertiles_sympy(current_tiles_sympy)
-    # print(i,current_tiles_sympy)
+def tile_info_str(tile_transformation, label):
+    return str({'label': label, 'rotate_deg': trot_inv(tile_transformation), 'moves': [tile_transformation[0,2], tile_transformation[1,2]]})
 
 def do_print_tile(tile_transformation, label):
-    print({'label': label, 'rotate_deg': trot_inv(tile_transformation), 'moves': [tile_transformation[0,2], tile_transformation[1,2]]})
+    print(tile_info_str(tile_transformation, label))
 
-current_tiles_sympy["Delta"].forEachTile(do_print_tile)
-
-# all_tiles_info = []
-# def collect_tiles(tile_transformation, label):
-#     global all_tiles_info
-#     all_tiles_info.append({'label': label, 'transformation': tile_transformation})
+# Convert each matrix to LaTeX
+def to_latex_str(transformation_matrix, label):
+    # Use sympy.latex() to convert the matrix to LaTeX code
+    latex_matrix = sp.latex(transformation_matrix, mat_str='pmatrix')
 
-# current_tiles_sympy["Delta"].forEachTile(collect_tiles)
-# print(all_tiles_info)
+    latex_output = f"\\section*{{Tile: {label}}}"
+    latex_output += f"\\begin{{equation*}}\n"
+    latex_output += latex_matrix + "\n"
+    latex_output += f"\\end{{equation*}}\n"
+    latex_output += r"\vspace{0.5cm}" + "\n\n"
+    return latex_output
 
-# Start of the LaTeX document
-latex_output = r"""\documentclass{article}
+def get_subtree_paths(tile, n_paths):
+    """
+    paths of child indices splitting tile into at least n_paths subtrees, in forEachTile order
+    """
+    paths = [()]
+    nodes = [tile]
+    while len(paths) < n_paths and any(isinstance(node, MetaTile) for node in nodes):
+        next_paths, next_nodes = [], []
+        for path, node in zip(paths, nodes):
+            if isinstance(node, MetaTile):
+                next_paths += [path + (i,) for i in range(len(node.tiles))]
+                next_nodes += node.tiles
+            else:
+                next_paths.append(path)
+                next_nodes.append(node)
+        paths, nodes = next_paths, next_nodes
+    return paths
+
+worker_root_tile = None
+def init_worker(n_iterations, rotation, cache_dir, root_label="Delta"):
+    global worker_root_tile
+    worker_root_tile = buildSpectreTiles_sympy(n_iterations, rotation, cache_dir)[root_label]
+
+def expand_subtree(path, root_tile=None):
+    """
+    expand the subtree at path of child indices down to Tiles
+    returns (tile info lines, LaTeX sections) of its Tiles
+    """
+    tile = worker_root_tile if root_tile is None else root_tile
+    transformation = IDENTITY
+    for i in path:
+        transformation = mul_sympy(transformation, tile.transformations[i])
+        tile = tile.tiles[i]
+    infos, sections = [], []
+    def collect(tile_transformation, label):
+        infos.append(tile_info_str(tile_transformation, label))
+        sections.append(to_latex_str(tile_transformation, label))
+    tile.forEachTile(collect, transformation)
+    return "\n".join(infos), "".join(sections)
+
+def write_sections(f, results):
+    for infos, sections in results:
+        print(infos)
+        f.write(sections)
+
+def main(n_iterations=n_ITERATIONS, rotation=ROTATION, n_processes=N_PROCESSES, cache_dir=CACHE_DIR, latex_file=LATEX_FILE):
+    SPECTRE_POINTS_SYM = get_spectre_points_sympy(Edge_a, Edge_b)
+    print("Spectre(Gamma1) points=", SPECTRE_POINTS_SYM)
+    Mystec_SPECTRE_POINTS_SYM = get_spectre_points_sympy(Edge_b, Edge_a)
+    print("Spectre(Gamma2) points=", Mystec_SPECTRE_POINTS_SYM)
+
+    print("Built symbolic tiles for iteration ", n_iterations)
+    root_tile = buildSpectreTiles_sympy(n_iterations, rotation, cache_dir)["Delta"]
+
+    os.makedirs(os.path.dirname(latex_file) or '.', exist_ok=True)
+    tmp_file = latex_file + '.tmp'
+    try:
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            # Start of the LaTeX document
+            f.write(r"""\documentclass{article}
 \usepackage{amsmath}
 \usepackage{amssymb}
 \usepackage[a4paper, margin=1in]{geometry}
@@ -238,34 +332,29 @@ latex_output = r"""\documentclass{article}
 \date{}
 \maketitle
 
-"""
-
-latex_output += f"This document contains the LaTeX representations of the symbolic transformation matrices for {{n_ITERATIONS}}times iteration of the Spectre tiles. "
-latex_output += r"""These matrices describe the rotation and translation of each sub-tile within the main "Delta" supertile. 
+""")
+            f.write(f"This document contains the LaTeX representations of the symbolic transformation matrices for {{n_ITERATIONS}}times iteration of the Spectre tiles. ")
+            f.write(r"""These matrices describe the rotation and translation of each sub-tile within the main "Delta" supertile. 
 The transformations are expressed in terms of the symbolic edge lengths, \textbf{Edge\_a} and \textbf{Edge\_b}.
 
-"""
-
-# Iterate through the list and convert each matrix to LaTeX
-def to_latex_str(transformation_matrix, label):
-    global latex_output    
-    # Use sympy.latex() to convert the matrix to LaTeX code
-    latex_matrix = sp.latex(transformation_matrix, mat_str='pmatrix')
-    
-    latex_output += f"\\section*{{Tile: {label}}}"
-    latex_output += f"\\begin{{equation*}}\n"
-    latex_output += latex_matrix + "\n"
-    latex_output += f"\\end{{equation*}}\n"
-    latex_output += r"\vspace{0.5cm}" + "\n\n"
-
-current_tiles_sympy["Delta"].forEachTile(to_latex_str) 
-# End of the LaTeX document
-latex_output += r"""
+""")
+            # print and write each subtree as soon as it is expanded, in tile order
+            paths = get_subtree_paths(root_tile, n_processes * 4)
+            if n_processes > 1:
+                with Pool(n_processes, initializer=init_worker, initargs=(n_iterations, rotation, cache_dir)) as pool:
+                    write_sections(f, pool.imap(expand_subtree, paths))
+            else:
+                write_sections(f, (expand_subtree(path, root_tile) for path in paths))
+            # End of the LaTeX document
+            f.write(r"""
 \end{document}
-"""
-
-# print(latex_output)
-tmp = './tmp/einsteintile.tex'
-open(tmp,'wb').write(latex_output.encode('utf-8'))
-# import subprocess
-# subprocess.check_call(['pdflatex', '--output-format', 'pdf', '--output-directory','/tmp', tmp])
+""")
+        os.replace(tmp_file, latex_file)  # a failed run never leaves a partial document
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    # import subprocess
+    # subprocess.check_call(['pdflatex', '--output-format', 'pdf', '--output-directory','/tmp', latex_file])
+
+if __name__ == '__main__':
+    main(n_processes=1 if '--serial' in sys.argv else N_PROCESSES)